@@ -0,0 +1,78 @@
+"""
+Write-behind strength boosts.
+Read paths (semantic search/expand, patterns recall) record boosts here instead
+of issuing an UPDATE per hit. Increments merge per id and flush as a single
+UPDATE ... CASE in one transaction — on a timer, once enough ids are pending,
+or at process exit.
+"""
+
+import atexit
+import sqlite3
+import sys
+import threading
+
+FLUSH_DELAY = 2.0      # seconds after the first pending boost
+MAX_PENDING = 64       # distinct ids before an immediate flush
+CHUNK = 300            # ids per statement (3 bound params each)
+
+
+class BoostBuffer:
+    """Pending boosts for one table. set_clause(delta_sql) returns the SET part of
+    the UPDATE, with delta_sql standing for the merged per-id increment."""
+
+    def __init__(self, db_path, table, set_clause, flush_delay=FLUSH_DELAY, max_pending=MAX_PENDING):
+        self.db_path = db_path
+        self.table = table
+        self.set_clause = set_clause
+        self.flush_delay = flush_delay
+        self.max_pending = max_pending
+        self._pending = {}
+        self._timer = None
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def add(self, ids, amount):
+        """Queue +amount for each id."""
+        with self._lock:
+            for mid in ids:
+                self._pending[mid] = self._pending.get(mid, 0.0) + amount
+            due = len(self._pending) >= self.max_pending
+            if not due and self._timer is None and self._pending:
+                self._timer = threading.Timer(self.flush_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if due:
+            self.flush()
+
+    def pending(self, mid):
+        """Boost queued for id but not yet written."""
+        with self._lock:
+            return self._pending.get(mid, 0.0)
+
+    def flush(self):
+        """Write all pending boosts in one transaction."""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not batch:
+            return
+
+        items = list(batch.items())
+        try:
+            conn = sqlite3.connect(self.db_path)
+            with conn:
+                for start in range(0, len(items), CHUNK):
+                    part = items[start:start + CHUNK]
+                    case = 'CASE id ' + ' '.join('WHEN ? THEN ?' for _ in part) + ' END'
+                    marks = ','.join('?' * len(part))
+                    params = [v for pair in part for v in pair] + [mid for mid, _ in part]
+                    conn.execute(
+                        f'UPDATE {self.table} SET {self.set_clause(case)} WHERE id IN ({marks})',
+                        params
+                    )
+            conn.close()
+        except Exception as e:
+            sys.stderr.write(f"Boost flush failed ({self.table}): {e}\n")
+            sys.stderr.flush()
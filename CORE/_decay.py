@@ -0,0 +1,26 @@
+"""
+Lazy memory strength decay.
+semantic.db stores (base_strength, touched_cycle) per memory; effective strength
+is derived at read time, so drives:start never rewrites the memories table.
+
+Decay: -0.01 on every cycle divisible by 10, floored at 0.0.
+Decays since touched = cycle // 10 - touched_cycle // 10.
+"""
+
+DECAY_AMOUNT = 0.01
+DECAY_INTERVAL = 10
+
+# Decay-anchored strength: effective = MAX(key - DECAY_AMOUNT * (cycle // 10), 0).
+# Orders identically to effective strength at any cycle, so it can carry an index.
+STRENGTH_KEY_SQL = f'(base_strength + {DECAY_AMOUNT} * (touched_cycle / {DECAY_INTERVAL}))'
+
+
+def strength_sql(cycle):
+    """SQL expression for effective strength at the given cycle."""
+    return f'MAX({STRENGTH_KEY_SQL} - {DECAY_AMOUNT * (int(cycle) // DECAY_INTERVAL)!r}, 0.0)'
+
+
+def effective_strength(base_strength, touched_cycle, cycle):
+    """Python mirror of strength_sql."""
+    decays = int(cycle) // DECAY_INTERVAL - int(touched_cycle) // DECAY_INTERVAL
+    return max(base_strength - DECAY_AMOUNT * decays, 0.0)
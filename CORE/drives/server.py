@@ -28,7 +28,8 @@ def get_conn():
 
 
 def handle_start():
-    """Begin a cycle. Read last drives, decay, insert new row, decay needs/memories, render dashboard."""
+    """Begin a cycle. Read last drives, decay, insert new row, decay needs, render dashboard.
+    Memory strength decays lazily at read time (see _decay.py) — nothing to do here."""
     conn = get_conn()
 
     last = conn.execute('SELECT * FROM drives ORDER BY cycle DESC LIMIT 1').fetchone()
@@ -50,10 +51,6 @@ def handle_start():
     # Decay needs
     decay_needs(cycle)
 
-    # Decay memory strength every 10 cycles
-    if cycle % 10 == 0:
-        _decay_memories()
-
     # Render dashboard
     try:
         from state.render import render
@@ -74,17 +71,6 @@ def handle_start():
     return content
 
 
-def _decay_memories():
-    """Reduce all memory strengths by 0.01. Called every 10 cycles."""
-    try:
-        conn = sqlite3.connect(DATA / 'semantic.db')
-        conn.execute('UPDATE memories SET strength = MAX(strength - 0.01, 0.0)')
-        conn.commit()
-        conn.close()
-    except Exception:
-        pass
-
-
 def handle_snapshot(args):
     """Record drive state. Same cycle, new row. No increment, no decay."""
     # Validate all 10 drives present
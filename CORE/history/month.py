@@ -10,6 +10,7 @@ import sys
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from _paths import DATA, get_cycle
+from _decay import strength_sql
 
 SEMANTIC_DB = DATA / 'semantic.db'
 HEART_DB = DATA / 'heart.db'
@@ -44,8 +45,10 @@ def generate_month(lookback=10):
     sections = []
 
     # 1. Semantic — memories with strength >= threshold
+    strength = strength_sql(current)
     rows = _safe_query(SEMANTIC_DB,
-        'SELECT id, title, strength FROM memories WHERE cycle BETWEEN ? AND ? AND strength >= ? ORDER BY strength DESC',
+        f'SELECT id, title, {strength} AS strength FROM memories '
+        f'WHERE cycle BETWEEN ? AND ? AND {strength} >= ? ORDER BY strength DESC',
         (min_cycle, current, SEMANTIC_STRENGTH))
     if rows:
         sections.append("Memories that stuck:")
@@ -12,11 +12,15 @@ sys.stdout.reconfigure(encoding='utf-8')
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from _paths import DATA, get_cycle
 from _needs import update_needs
+from _boost import BoostBuffer
 
 DB = DATA / 'patterns.db'
 BOOST = 0.1
 MAX_CHARS = 40
 
+# Recall boosts are written behind, merged per id (see _boost.py).
+BOOSTS = BoostBuffer(DB, 'patterns', lambda delta: f'strength = MIN(strength + {delta}, 1.0)')
+
 
 def get_conn():
     conn = sqlite3.connect(DB)
@@ -29,9 +33,10 @@ def cap(text):
     return text.strip()[:MAX_CHARS].rstrip()
 
 
-def format_pattern(r):
+def format_pattern(r, strength=None):
     """Display: #id [domain] strength\n  action → reason → result → lesson"""
-    return (f"#{r['id']} [{r['domain']}] {r['strength']:.1f}\n"
+    strength = r['strength'] if strength is None else strength
+    return (f"#{r['id']} [{r['domain']}] {strength:.1f}\n"
             f"  {r['action']} → {r['reason']} → {r['result']} → {r['lesson']}")
 
 
@@ -98,20 +103,15 @@ def handle_recall(args):
         conn.close()
         return [{"type": "text", "text": f"No patterns matching '{search}'."}]
 
-    # Boost matched patterns
-    for r in rows:
-        new_strength = min(r['strength'] + BOOST, 1.0)
-        conn.execute('UPDATE patterns SET strength = ? WHERE id = ?', (new_strength, r['id']))
-    conn.commit()
-
-    # Re-fetch with updated strengths
-    ids = ','.join(str(r['id']) for r in rows)
-    rows = conn.execute(
-        f'SELECT * FROM patterns WHERE id IN ({ids}) ORDER BY strength DESC'
-    ).fetchall()
     conn.close()
 
-    lines = [format_pattern(r) for r in rows]
+    # Boost matched patterns (queued; shown as if already applied)
+    # (read what was queued before adding: add() may flush, emptying the buffer)
+    boosted = [(r, min(r['strength'] + BOOSTS.pending(r['id']) + BOOST, 1.0)) for r in rows]
+    BOOSTS.add([r['id'] for r in rows], BOOST)
+    boosted.sort(key=lambda pair: pair[1], reverse=True)
+
+    lines = [format_pattern(r, strength) for r, strength in boosted]
     return [{"type": "text", "text": '\n'.join(lines)}]
 
 
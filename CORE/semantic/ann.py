@@ -0,0 +1,115 @@
+"""
+Approximate nearest-neighbour search — inverted-file (IVF) index in NumPy.
+Vectors are bucketed by nearest centroid; a query scans only the nprobe
+closest buckets. Persisted to DATA/semantic.ivf.npz next to semantic.db.
+"""
+
+import numpy as np
+
+from db import DATA
+
+IVF_PATH = DATA / 'semantic.ivf.npz'
+CHUNK_IVF_PATH = DATA / 'semantic.chunks.ivf.npz'
+
+TRAIN_ITERATIONS = 10
+TRAIN_SAMPLE = 50000
+CHUNK = 16384
+
+
+def nlist_for(count):
+    """Bucket count ~ sqrt(N), clamped to [16, 4096] and never more than N."""
+    return int(min(max(np.sqrt(count), 16), 4096, count))
+
+
+def nearest(matrix, centroids):
+    """Index of the closest centroid for each row (chunked to bound memory)."""
+    out = np.empty(len(matrix), dtype=np.int32)
+    for start in range(0, len(matrix), CHUNK):
+        block = matrix[start:start + CHUNK]
+        out[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def train_centroids(matrix, nlist, seed=0):
+    """Spherical k-means on a sample of the (normalised) rows."""
+    rng = np.random.default_rng(seed)
+    sample = matrix
+    if len(matrix) > TRAIN_SAMPLE:
+        sample = matrix[np.sort(rng.choice(len(matrix), TRAIN_SAMPLE, replace=False))]
+    nlist = min(nlist, len(sample))  # each centroid is seeded from a distinct row
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+    for _ in range(TRAIN_ITERATIONS):
+        assign = nearest(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] == 0
+        sums[empty] = centroids[empty]
+        norms[empty] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+
+    return centroids
+
+
+class IVFIndex:
+    """Bucket assignments for the rows of a VectorIndex, by row position."""
+
+    def __init__(self, centroids, ids, assign, trained_on, model, path=IVF_PATH):
+        self.centroids = centroids
+        self.ids = ids
+        self.assign = assign
+        self.trained_on = trained_on
+        self.model = model
+        self.path = path
+        self.unsaved = 0
+
+    @property
+    def count(self):
+        return len(self.assign)
+
+    @classmethod
+    def train(cls, ids, matrix, model, path=IVF_PATH):
+        centroids = train_centroids(matrix, nlist_for(len(matrix)))
+        return cls(centroids, np.array(ids, dtype=np.int64), nearest(matrix, centroids), len(matrix), model, path)
+
+    @classmethod
+    def load(cls, ids, dim, model, path=IVF_PATH):
+        """Load from disk if it still describes a prefix of ids from the same
+        model (vecfile model tag). None otherwise."""
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as f:
+                centroids, saved_ids = f['centroids'], f['ids']
+                assign, trained_on = f['assign'], int(f['trained_on'])
+                saved_model = f['model'].tobytes() if 'model' in f else None
+        except Exception:
+            return None
+        if saved_model != model or centroids.shape[1] != dim or len(saved_ids) > len(ids):
+            return None
+        if not np.array_equal(saved_ids, ids[:len(saved_ids)]):
+            return None
+        return cls(centroids, saved_ids, assign, trained_on, model, path)
+
+    def save(self):
+        tmp = self.path.with_suffix('.tmp.npz')
+        np.savez(tmp, centroids=self.centroids, ids=self.ids,
+                 assign=self.assign, trained_on=np.int64(self.trained_on),
+                 model=np.frombuffer(self.model, dtype=np.uint8))
+        tmp.replace(self.path)
+        self.unsaved = 0
+
+    def extend(self, ids, matrix):
+        """Bucket rows appended to the VectorIndex since the last call."""
+        if len(ids) == 0:
+            return
+        self.ids = np.concatenate([self.ids, ids])
+        self.assign = np.concatenate([self.assign, nearest(matrix, self.centroids)])
+        self.unsaved += len(ids)
+
+    def candidates(self, query, nprobe):
+        """Row positions in the nprobe buckets closest to query."""
+        nprobe = min(nprobe, len(self.centroids))
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.flatnonzero(np.isin(self.assign, probe))
@@ -0,0 +1,246 @@
+"""
+Cold tier — DATA/semantic_archive.db, attached to a connection as "archive".
+Memories whose strength has stayed below archive_threshold for archive_after
+cycles move out of semantic.db: the row (vector included) plus the .md content,
+zlib-compressed, with its own contentless FTS5 index. Their chunks, links and
+file are dropped. Default search never touches the archive; search with
+deep = true also scans it, and expand revives an archived memory into the hot
+tier (file, FTS row, chunks and links rebuilt).
+"""
+
+import sqlite3
+import zlib
+
+import numpy as np
+
+from config import setting
+from db import (get_cycle, bump_generation, index_text, unindex_text, memory_file, read_memory, memory_exists,
+                write_memory, unpack_embedding, DATA, CODECS, STRENGTH_KEY_SQL)
+from _decay import DECAY_AMOUNT, DECAY_INTERVAL, effective_strength
+from embed import EMBED_MODEL
+from index import normalize, normalize_rows, top_k
+from chunks import chunks_for, insert_chunks
+import links
+from pipeline import enqueue
+
+ARCHIVE_DB = DATA / 'semantic_archive.db'
+
+ARCHIVE_BATCH = 500  # memories moved per transaction
+
+COLUMNS = ('id, title, summary, embedding, embedding_model, embedding_dim, '
+           'category, level, base_strength, touched_cycle, cycle, path')
+
+
+def attach(conn):
+    """Attach the archive as schema "archive" (created on first use). Idempotent."""
+    if any(r['name'] == 'archive' for r in conn.execute('PRAGMA database_list')):
+        return
+    conn.execute('ATTACH DATABASE ? AS archive', (str(ARCHIVE_DB),))
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS archive.memories ('
+        'id INTEGER PRIMARY KEY, title TEXT, summary TEXT, embedding BLOB, embedding_model TEXT, '
+        'embedding_dim INTEGER, category TEXT, level INTEGER, base_strength REAL, touched_cycle INTEGER, '
+        'cycle INTEGER, path TEXT, content BLOB, archived_cycle INTEGER)'
+    )
+    try:
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS archive.memories_fts "
+            "USING fts5(title, summary, content, content = '', tokenize = 'porter unicode61')"
+        )
+    except sqlite3.OperationalError:
+        pass  # SQLite without FTS5: deep search is vector-only
+    conn.commit()
+
+
+def exists():
+    """True once the archive file has been created (by the first sweep that moved anything)."""
+    return ARCHIVE_DB.exists()
+
+
+def count(conn):
+    if not exists():
+        return 0
+    attach(conn)
+    return conn.execute('SELECT COUNT(*) FROM archive.memories').fetchone()[0]
+
+
+def _read(rel_path):
+    try:
+        return read_memory(rel_path) if rel_path else ''
+    except OSError:
+        return ''
+
+
+def candidates(conn, cycle):
+    """Hot memories untouched for archive_after cycles whose strength was already
+    below archive_threshold then. Compares the decay-anchored key (indexed)."""
+    threshold = setting('archive_threshold')
+    since = int(cycle) - setting('archive_after')
+    if threshold <= 0 or since < 0:
+        return []
+    return conn.execute(
+        f'SELECT id, title, summary, path FROM main.memories '
+        f'WHERE touched_cycle <= ? AND {STRENGTH_KEY_SQL} < ? ORDER BY id',
+        (since, threshold + DECAY_AMOUNT * (since // DECAY_INTERVAL))
+    ).fetchall()
+
+
+def sweep(conn):
+    """Move faded memories to the archive. Returns the number moved. Does nothing
+    (and creates no archive file) while archive_threshold is 0."""
+    if setting('archive_threshold') <= 0:
+        return 0
+    cycle = get_cycle()
+    rows = candidates(conn, cycle)
+    if rows:
+        attach(conn)
+    for start in range(0, len(rows), ARCHIVE_BATCH):
+        batch = rows[start:start + ARCHIVE_BATCH]
+        ids = [r['id'] for r in batch]
+        marks = ','.join('?' * len(ids))
+        contents = {r['id']: _read(r['path']) for r in batch}
+
+        conn.executemany(
+            f'INSERT INTO archive.memories ({COLUMNS}, content, archived_cycle) '
+            f'SELECT {COLUMNS}, ?, ? FROM main.memories WHERE id = ?',
+            [(zlib.compress(contents[mid].encode('utf-8')), cycle, mid) for mid in ids]
+        )
+        try:
+            conn.executemany(
+                'INSERT INTO archive.memories_fts (rowid, title, summary, content) VALUES (?, ?, ?, ?)',
+                [(r['id'], r['title'], r['summary'], contents[r['id']]) for r in batch]
+            )
+        except sqlite3.OperationalError:
+            pass
+        for r in batch:
+            unindex_text(conn, r['id'], r['title'], r['summary'], contents[r['id']])
+
+        vectors = conn.execute(
+            f'SELECT COUNT(embedding) FROM main.memories WHERE id IN ({marks})', ids
+        ).fetchone()[0]
+        chunk_vectors = conn.execute(
+            f'SELECT COUNT(embedding) FROM chunks WHERE memory_id IN ({marks})', ids
+        ).fetchone()[0]
+        conn.execute(f'DELETE FROM chunks WHERE memory_id IN ({marks})', ids)
+        conn.execute(f'DELETE FROM memory_links WHERE id IN ({marks}) OR neighbour_id IN ({marks})', ids + ids)
+        conn.execute(f'DELETE FROM embed_queue WHERE id IN ({marks})', ids)
+        conn.execute(f'DELETE FROM main.memories WHERE id IN ({marks})', ids)
+        if vectors:
+            bump_generation(conn)
+        if chunk_vectors:
+            bump_generation(conn, 'chunk_generation')
+        bump_generation(conn, 'data_version')
+        conn.commit()
+
+        # Content is safe in the archive: drop the files.
+        for r in batch:
+            if r['path']:
+                memory_file(r['path']).unlink(missing_ok=True)
+    return len(rows)
+
+
+def _restore_file(rel_path, content, level):
+    """Write content back under its old name (compressed per the current setting), or a
+    free _N variant if a newer memory took it. Returns the relative path written."""
+    if memory_file(rel_path).exists() and read_memory(rel_path) == content:
+        return rel_path  # archived, but the file was never removed
+    for suffix, _ in CODECS.values():
+        if rel_path.endswith(suffix):
+            rel_path = rel_path[:-len(suffix)]
+    base = memory_file(rel_path)
+    path, counter = base, 1
+    while memory_exists(path):
+        path = base.with_name(f'{base.stem}_{counter}{base.suffix}')
+        counter += 1
+    return write_memory(path, content, level)
+
+
+def revive(conn, mid):
+    """Move an archived memory back into the hot tier (commits). Its strength is
+    re-anchored at the current cycle. False if mid is not archived."""
+    if not exists():
+        return False
+    attach(conn)
+    row = conn.execute(
+        f'SELECT {COLUMNS}, content FROM archive.memories WHERE id = ?', (mid,)
+    ).fetchone()
+    if row is None:
+        return False
+
+    content = zlib.decompress(row['content']).decode('utf-8') if row['content'] else ''
+    # A vector from another embed_model is dropped: the worker re-embeds the summary.
+    vec = unpack_embedding(row['embedding']) if row['embedding_model'] == EMBED_MODEL else None
+    embedding = (row['embedding'], row['embedding_model'], row['embedding_dim']) if vec is not None else (None,) * 3
+    neighbours = links.nearest(conn, vec, exclude=mid) if vec is not None else []
+    path = _restore_file(row['path'], content, row['level'] or 1) if row['path'] else None
+
+    cycle = get_cycle()
+    strength = effective_strength(row['base_strength'] or 0.0, row['touched_cycle'] or cycle, cycle)
+    conn.execute(
+        f'INSERT INTO main.memories ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (mid, row['title'], row['summary'], *embedding,
+         row['category'], row['level'], strength, cycle, row['cycle'], path)
+    )
+    index_text(conn, mid, row['title'], row['summary'], content)
+    insert_chunks(conn, mid, chunks_for(row['level'] or 1, content))  # embedded by the worker
+    links.link(conn, mid, neighbours)
+    if vec is None:
+        enqueue(conn, mid)
+    else:
+        bump_generation(conn)
+    bump_generation(conn, 'data_version')
+
+    try:
+        conn.execute(
+            "INSERT INTO archive.memories_fts (memories_fts, rowid, title, summary, content) "
+            "VALUES ('delete', ?, ?, ?, ?)", (mid, row['title'], row['summary'], content)
+        )
+    except sqlite3.OperationalError:
+        pass
+    conn.execute('DELETE FROM archive.memories WHERE id = ?', (mid,))
+    conn.commit()
+    return True
+
+
+def keyword_hits(conn, match, weights, limit):
+    """Archived ids matching an FTS5 expression, BM25-ranked with the given column weights."""
+    if not exists():
+        return []
+    attach(conn)
+    try:
+        rows = conn.execute(
+            'SELECT rowid FROM archive.memories_fts WHERE memories_fts MATCH ? '
+            'ORDER BY bm25(memories_fts, ?, ?, ?) LIMIT ?',
+            (match, *weights, limit)
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return []
+    return [r[0] for r in rows]
+
+
+def vector_hits(conn, query_embedding, limit):
+    """Archived ids by cosine similarity, best first. The cold tier has no resident
+    index: its current-model vectors are read and scanned per deep search."""
+    if not exists():
+        return []
+    attach(conn)
+    rows = conn.execute(
+        'SELECT id, embedding FROM archive.memories WHERE embedding IS NOT NULL AND embedding_model = ?',
+        (EMBED_MODEL,)
+    ).fetchall()
+    query = normalize(query_embedding)
+    rows = [r for r in rows if r['embedding'] is not None and len(r['embedding']) == 4 * len(query)]
+    if not rows:
+        return []
+    matrix = normalize_rows(np.stack([unpack_embedding(r['embedding']) for r in rows]))
+    scores = matrix @ query
+    return [rows[i]['id'] for i in top_k(scores, limit)]
+
+
+def titles(conn, ids):
+    """{id: title} for archived ids."""
+    if not ids:
+        return {}
+    marks = ','.join('?' * len(ids))
+    rows = conn.execute(f'SELECT id, title FROM archive.memories WHERE id IN ({marks})', list(ids))
+    return {r['id']: r['title'] for r in rows}
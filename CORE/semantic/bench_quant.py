@@ -0,0 +1,113 @@
+"""
+Benchmark: int8 and PCA first-pass index scans vs the float32 baseline.
+
+Usage:
+    python bench_quant.py [--n 100000] [--dim 384] [--queries 200] [--rerank 64] [--pca-dim 96] [--pca-rerank 1024] [--db]
+
+Reports resident vector bytes, ms/query and recall@10 against the exact
+float32 top-10 for: float32 scan, int8 codes only, int8 + exact re-rank,
+PCA projection only, PCA + exact re-rank.
+Synthetic clustered vectors by default; --db uses the embeddings in
+semantic.db (queries are then drawn from the stored vectors themselves).
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from index import normalize_rows, top_k
+from quant import Int8Codes
+from pca import PCAProjection
+
+K = 10
+
+
+def synthetic(n, dim, queries, seed=0):
+    """Clustered unit vectors (sentence embeddings are far from uniform) + held-out queries."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((max(n // 500, 8), dim)).astype(np.float32)
+    def sample(count):
+        picks = rng.integers(0, len(centres), count)
+        return normalize_rows(centres[picks] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32))
+    return sample(n), sample(queries)
+
+
+def from_db(queries, seed=0):
+    from db import get_conn, unpack_embedding
+    from config import setting
+    conn = get_conn()
+    rows = conn.execute(
+        'SELECT embedding FROM memories WHERE embedding IS NOT NULL AND embedding_model = ?',
+        (setting('embed_model'),)
+    ).fetchall()
+    conn.close()
+    matrix = normalize_rows(np.stack([unpack_embedding(r['embedding']) for r in rows]))
+    picks = np.random.default_rng(seed).choice(len(matrix), min(queries, len(matrix)), replace=False)
+    return matrix, matrix[picks]
+
+
+def timed(fn, queries):
+    start = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return results, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def recall(results, truth):
+    return np.mean([len(set(r[:K]) & set(t[:K])) / K for r, t in zip(results, truth)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='int8 / PCA vs float32 vector scan: recall@10 and speed.')
+    parser.add_argument('--n', type=int, default=100000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--rerank', type=int, default=64)
+    parser.add_argument('--pca-dim', type=int, default=96)
+    parser.add_argument('--pca-rerank', type=int, default=1024)
+    parser.add_argument('--db', action='store_true', help='use embeddings from semantic.db')
+    args = parser.parse_args()
+
+    matrix, queries = from_db(args.queries) if args.db else synthetic(args.n, args.dim, args.queries)
+    codes = Int8Codes.build(np.arange(len(matrix)), matrix, b'')
+    start = time.perf_counter()
+    pca = PCAProjection.fit(np.arange(len(matrix)), matrix, args.pca_dim, b'')
+    fit_s = time.perf_counter() - start
+    print(f"{len(matrix)} vectors x {matrix.shape[1]} dims, {len(queries)} queries")
+
+    def exact(q):
+        return top_k(matrix @ q, K)
+
+    def int8_only(q):
+        return top_k(codes.scores(q), K)
+
+    def int8_rerank(q):
+        rows = top_k(codes.scores(q), max(K, args.rerank))
+        return rows[top_k(matrix[rows] @ q, K)]
+
+    def pca_only(q):
+        return top_k(pca.scores(q), K)
+
+    def pca_rerank(q):
+        rows = top_k(pca.scores(q), max(K, args.pca_rerank))
+        return rows[top_k(matrix[rows] @ q, K)]
+
+    truth, ms_exact = timed(exact, queries)
+    approx, ms_int8 = timed(int8_only, queries)
+    reranked, ms_rerank = timed(int8_rerank, queries)
+    projected, ms_pca = timed(pca_only, queries)
+    pca_reranked, ms_pca_rerank = timed(pca_rerank, queries)
+
+    print(f"  {'':<22}{'MB':>8}{'ms/query':>10}{'recall@10':>11}")
+    print(f"  {'float32':<22}{matrix.nbytes / 1e6:>8.1f}{ms_exact:>10.2f}{1.0:>11.4f}")
+    print(f"  {'int8':<22}{codes.nbytes / 1e6:>8.1f}{ms_int8:>10.2f}{recall(approx, truth):>11.4f}")
+    print(f"  {f'int8 + rerank {args.rerank}':<22}{codes.nbytes / 1e6:>8.1f}{ms_rerank:>10.2f}"
+          f"{recall(reranked, truth):>11.4f}")
+    print(f"  {f'pca {args.pca_dim}':<22}{pca.nbytes / 1e6:>8.1f}{ms_pca:>10.2f}{recall(projected, truth):>11.4f}")
+    print(f"  {f'pca {args.pca_dim} + rerank {args.pca_rerank}':<22}{pca.nbytes / 1e6:>8.1f}{ms_pca_rerank:>10.2f}"
+          f"{recall(pca_reranked, truth):>11.4f}")
+    print(f"  (PCA fit: {fit_s:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
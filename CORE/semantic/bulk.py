@@ -0,0 +1,345 @@
+"""
+Bulk import/export of semantic memories as NDJSON — one JSON object per line.
+
+Usage:
+    python bulk.py import FILE [--batch N]                      (FILE "-" = stdin)
+    python bulk.py export FILE [--archived] [--embeddings] [--category C]   (FILE "-" = stdout)
+
+Import records take store's fields (title, category, summary, content) plus
+optional cycle, strength, and embedding_model + embedding (base64 float32,
+as written by export --embeddings; reused when the model matches and the
+vector is finite and of the stored dimension, so a migration need not re-embed). Summaries and chunks are embedded in
+embed_batch_size batches; every file and row is written in one transaction,
+with one generation bump, and without store's per-item similarity report.
+Links are computed once the batch is in the index. Records that fail
+validation are skipped and reported by record number.
+"""
+
+import argparse
+import base64
+import json
+import sys
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from config import setting
+from db import (get_conn, get_cycle, migrate, bump_generation, index_text, embedding_fields,
+                write_memory, read_memory, memory_file, strength_sql, EMBED_DTYPE, DATA)
+from embed import encode_many, EMBED_MODEL
+from chunks import chunks_for, insert_chunks, add_to_index
+import links
+import archive
+from index import get_index, get_chunk_index
+from pipeline import enqueue, get_worker
+from store import prepare, unique_file
+
+REPORT_ERRORS = 10  # skipped records listed per import reply
+
+
+def resolve(path):
+    """Tool paths: absolute, or relative to the LIFE root."""
+    path = Path(path).expanduser()
+    return path if path.is_absolute() else DATA.parent / path
+
+
+def read_ndjson(lines):
+    """NDJSON lines → records; unparseable lines become error strings. Blank lines are skipped."""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield f"invalid JSON: {e.msg}"
+            continue
+        yield record if isinstance(record, dict) else "not a JSON object"
+
+
+def _vector(record):
+    """A record's exported embedding, if it came from the configured model and is
+    finite. Its dimension is checked against the store in _embed."""
+    if record.get('embedding_model') != EMBED_MODEL or not record.get('embedding'):
+        return None
+    try:
+        vec = np.frombuffer(base64.b64decode(record['embedding']), dtype=EMBED_DTYPE)
+    except (ValueError, TypeError):
+        return None
+    return vec if len(vec) and np.isfinite(vec).all() else None
+
+
+def _model_dim():
+    """Dimension of the configured model's stored vectors, None before the first."""
+    conn = get_conn()
+    row = conn.execute(
+        'SELECT embedding_dim FROM memories WHERE embedding_model = ? AND embedding_dim IS NOT NULL LIMIT 1',
+        (EMBED_MODEL,)
+    ).fetchone()
+    conn.close()
+    return row[0] if row else None
+
+
+def _embed(items, batch_size, dim):
+    """Fill in summary and chunk vectors for a batch, one encode_many call each.
+    Imported vectors of another dimension than dim are re-embedded. Returns dim,
+    taken from the first vector seen if it was None."""
+    need = [item for item in items
+            if item['embedding'] is None or (dim is not None and len(item['embedding']) != dim)]
+    for item, vec in zip(need, encode_many([item['summary'] for item in need], batch_size)):
+        item['embedding'] = vec
+        if dim is None and vec is not None:
+            dim = len(vec)
+    if dim is None:
+        dim = next((len(item['embedding']) for item in items if item['embedding'] is not None), None)
+    wrong = [item for item in items if item['embedding'] is not None and len(item['embedding']) != dim]
+    for item, vec in zip(wrong, encode_many([item['summary'] for item in wrong], batch_size) if wrong else []):
+        item['embedding'] = vec if vec is not None and len(vec) == dim else None
+    texts = [text for item in items for text in item['chunk_texts']]
+    vectors = iter(encode_many(texts, batch_size) if texts else [])
+    for item in items:
+        item['chunk_vectors'] = [next(vectors) for _ in item['chunk_texts']]
+    return dim
+
+
+def prepare_many(records, batch_size=None):
+    """Validate and embed records in batches. Returns (items, errors [(n, message)])."""
+    batch_size = batch_size or setting('embed_batch_size')
+    cycle = get_cycle()
+    dim = _model_dim()
+    items, errors, batch = [], [], []
+    for n, record in enumerate(records, 1):
+        if isinstance(record, str):
+            errors.append((n, record))
+            continue
+        fields, error = prepare(record)
+        if error:
+            errors.append((n, error))
+            continue
+        title, category, summary, content, level = fields
+        try:
+            strength = min(max(float(record.get('strength', 1.0)), 0.0), 1.0)
+            item_cycle = int(record.get('cycle', cycle))
+        except (TypeError, ValueError):
+            errors.append((n, "cycle/strength must be numbers."))
+            continue
+        batch.append({
+            'title': title, 'category': category, 'summary': summary, 'content': content,
+            'level': level, 'cycle': item_cycle, 'strength': strength,
+            'embedding': _vector(record), 'chunk_texts': chunks_for(level, content),
+        })
+        if len(batch) >= batch_size:
+            dim = _embed(batch, batch_size, dim)
+            items += batch
+            batch = []
+    if batch:
+        _embed(batch, batch_size, dim)
+        items += batch
+    return items, errors
+
+
+def write_many(items):
+    """Write files and rows for prepared items in one transaction, then append them to
+    the indexes and link them. Returns the new ids. Rows without a vector are queued."""
+    conn = get_conn()
+    # Loaded indexes take the batch as one append instead of rebuilding on the next search.
+    get_index().refresh(conn)
+    get_chunk_index().refresh(conn)
+    cycle = get_cycle()
+    written, stored, ids, vectors, chunk_ids, chunk_vectors = [], [], [], [], [], []
+    queued = 0
+    try:
+        for item in items:
+            rel_path = write_memory(unique_file(item['category'], item['level'], item['title']),
+                                    item['content'], item['level'])
+            written.append(rel_path)
+            cur = conn.execute(
+                'INSERT INTO memories (title, summary, embedding, embedding_model, embedding_dim, '
+                'category, level, base_strength, touched_cycle, cycle, path) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (item['title'], item['summary'], *embedding_fields(item['embedding'], EMBED_MODEL),
+                 item['category'], item['level'], item['strength'], cycle, item['cycle'], rel_path)
+            )
+            mid = cur.lastrowid
+            stored.append(mid)
+            index_text(conn, mid, item['title'], item['summary'], item['content'])
+            cids, cvecs, _ = insert_chunks(conn, mid, item['chunk_texts'], item['chunk_vectors'], bump=False)
+            chunk_ids += cids
+            chunk_vectors += cvecs
+            if item['embedding'] is None:
+                enqueue(conn, mid)
+                queued += 1
+            else:
+                ids.append(mid)
+                vectors.append(item['embedding'])
+        generation = bump_generation(conn) if ids else None
+        chunk_generation = bump_generation(conn, 'chunk_generation') if chunk_ids else None
+        bump_generation(conn, 'data_version')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        conn.close()
+        for rel_path in written:
+            memory_file(rel_path).unlink(missing_ok=True)
+        raise
+
+    try:
+        if ids:
+            get_index().add_many(ids, vectors, generation)
+        add_to_index(chunk_ids, chunk_vectors, chunk_generation)
+
+        # Links against the index that now holds the whole batch.
+        for mid, vec in zip(ids, vectors):
+            links.link(conn, mid, links.nearest(conn, vec, exclude=mid))
+        conn.commit()
+    finally:
+        conn.close()
+
+    if queued or len(chunk_ids) < sum(len(item['chunk_texts']) for item in items):
+        get_worker().notify()
+    return stored
+
+
+def store_many(records, batch_size=None):
+    """Import records. Returns (ids, errors, seconds)."""
+    start = time.perf_counter()
+    items, errors = prepare_many(records, batch_size)
+    ids = write_many(items) if items else []
+    return ids, errors, time.perf_counter() - start
+
+
+def export_records(include_archived=False, embeddings=False, category=None):
+    """Every memory as an export record, hot tier first, in id order."""
+    conn = get_conn()
+    where, params = ('WHERE category = ?', (category,)) if category else ('', ())
+    strength = strength_sql(get_cycle())
+    sources = [('memories', False)]
+    if include_archived and archive.exists():
+        archive.attach(conn)
+        sources.append(('archive.memories', True))
+    try:
+        for table, archived in sources:
+            extra = ', content' if archived else ''
+            rows = conn.execute(
+                f'SELECT id, title, category, level, summary, cycle, path, embedding, embedding_model, '
+                f'{strength} AS strength{extra} FROM {table} {where} ORDER BY id', params
+            )
+            for r in rows:
+                if archived:
+                    content = zlib.decompress(r['content']).decode('utf-8') if r['content'] else ''
+                else:
+                    try:
+                        content = read_memory(r['path']) if r['path'] else ''
+                    except OSError:
+                        content = ''
+                record = {
+                    'id': r['id'], 'title': r['title'], 'category': r['category'], 'level': r['level'],
+                    'summary': r['summary'], 'content': content, 'cycle': r['cycle'],
+                    'strength': round(r['strength'] or 0.0, 4),
+                }
+                if archived:
+                    record['archived'] = True
+                if embeddings and r['embedding'] is not None and not isinstance(r['embedding'], str):
+                    record['embedding_model'] = r['embedding_model']
+                    record['embedding'] = base64.b64encode(r['embedding']).decode('ascii')
+                yield record
+    finally:
+        conn.close()
+
+
+def export(out, **options):
+    """Write export records to a text stream as NDJSON. Returns (count, seconds)."""
+    start = time.perf_counter()
+    count = 0
+    for record in export_records(**options):
+        out.write(json.dumps(record, ensure_ascii=False) + '\n')
+        count += 1
+    return count, time.perf_counter() - start
+
+
+def rate(count, seconds):
+    return f"{count / seconds:.0f}/s" if seconds > 0 else "-"
+
+
+def import_report(ids, errors, seconds):
+    lines = [f"Stored {len(ids)} memories in {seconds:.1f}s ({rate(len(ids), seconds)})."]
+    if ids:
+        lines[0] += f" #{ids[0]}" + (f"–#{ids[-1]}" if len(ids) > 1 else "")
+    if errors:
+        lines.append(f"Skipped {len(errors)}:")
+        lines += [f"  record {n}: {message}" for n, message in errors[:REPORT_ERRORS]]
+        if len(errors) > REPORT_ERRORS:
+            lines.append(f"  (+{len(errors) - REPORT_ERRORS} more)")
+    return '\n'.join(lines)
+
+
+def handle_store_many(args):
+    """Store many memories from a records list or an NDJSON file."""
+    if args.get('records') is not None:
+        records = args['records']
+        if not isinstance(records, list):
+            return [{"type": "text", "text": "records must be a list."}]
+        records = [r if isinstance(r, dict) else "not a JSON object" for r in records]
+        ids, errors, seconds = store_many(records)
+    elif args.get('path'):
+        try:
+            with open(resolve(args['path']), encoding='utf-8') as f:
+                ids, errors, seconds = store_many(read_ndjson(f))
+        except OSError as e:
+            return [{"type": "text", "text": f"Cannot read {args['path']}: {e.strerror}"}]
+    else:
+        return [{"type": "text", "text": "records or path required."}]
+    return [{"type": "text", "text": import_report(ids, errors, seconds)}]
+
+
+def handle_export(args):
+    """Export memories to an NDJSON file."""
+    if not args.get('path'):
+        return [{"type": "text", "text": "path required."}]
+    path = resolve(args['path'])
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            count, seconds = export(f, include_archived=bool(args.get('archived')),
+                                    embeddings=bool(args.get('embeddings')), category=args.get('category'))
+    except OSError as e:
+        return [{"type": "text", "text": f"Cannot write {args['path']}: {e.strerror}"}]
+    return [{"type": "text", "text": f"Exported {count} memories to {path} in {seconds:.1f}s ({rate(count, seconds)})."}]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk NDJSON import/export of semantic memories.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    imp = sub.add_parser('import', help='store every record of an NDJSON file')
+    imp.add_argument('file', help='NDJSON file, or - for stdin')
+    imp.add_argument('--batch', type=int, default=setting('embed_batch_size'),
+                     help='texts per embedding request (default: embed_batch_size)')
+    exp = sub.add_parser('export', help='write every memory as NDJSON')
+    exp.add_argument('file', help='output file, or - for stdout')
+    exp.add_argument('--archived', action='store_true', help='include archived memories')
+    exp.add_argument('--embeddings', action='store_true', help='include vectors (base64 float32)')
+    exp.add_argument('--category', help='only this category')
+    args = parser.parse_args()
+
+    migrate()
+    if args.command == 'import':
+        if args.file == '-':
+            ids, errors, seconds = store_many(read_ndjson(sys.stdin), args.batch)
+        else:
+            with open(args.file, encoding='utf-8') as f:
+                ids, errors, seconds = store_many(read_ndjson(f), args.batch)
+        print(import_report(ids, errors, seconds), file=sys.stderr)
+    else:
+        options = dict(include_archived=args.archived, embeddings=args.embeddings, category=args.category)
+        if args.file == '-':
+            count, seconds = export(sys.stdout, **options)
+        else:
+            with open(args.file, 'w', encoding='utf-8') as f:
+                count, seconds = export(f, **options)
+        print(f"Exported {count} memories in {seconds:.1f}s ({rate(count, seconds)}).", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Persistent embedding cache — DATA/embed_cache.db (WAL journal).
+Content-addressed: key = SHA-256 of model name + text, value = float32 BLOB.
+LRU eviction by last use, bounded by entry count (0 = cache off).
+Lookups never write: hit/miss counts and last-use times are kept in memory
+and flushed in one transaction with the next put, at most every
+FLUSH_SECONDS on reads, on stats() and at exit.
+Used by embed.py; embedding_service.py only when LIFE_EMBED_CACHE_SIZE is set.
+"""
+
+import atexit
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+import sys
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from _paths import DATA
+
+CACHE_DB = DATA / 'embed_cache.db'
+MAX_ENTRIES = 100000
+EVICT_EVERY = 256
+FLUSH_SECONDS = 30.0
+
+
+def cache_key(model, text):
+    return hashlib.sha256(f'{model}\0{text}'.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path=CACHE_DB, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn = None
+        self._lock = threading.Lock()
+        self._since_evict = 0
+        # Pending since the last flush.
+        self._hits = 0
+        self._misses = 0
+        self._touched = {}
+        self._flushed_at = time.monotonic()
+        if self.enabled:
+            atexit.register(self.flush)
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def _db(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY, vector BLOB, last_used REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used);
+                CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER);
+                INSERT OR IGNORE INTO stats VALUES ('hits', 0), ('misses', 0);
+            ''')
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, model, texts):
+        """Cached float32 vectors aligned with texts; None on miss (always None when off)."""
+        if not texts or not self.enabled:
+            return [None] * len(texts)
+        keys = [cache_key(model, t) for t in texts]
+        try:
+            with self._lock:
+                conn = self._db()
+                found = {}
+                for start in range(0, len(keys), 500):
+                    part = keys[start:start + 500]
+                    marks = ','.join('?' * len(part))
+                    for key, blob in conn.execute(
+                        f'SELECT key, vector FROM embeddings WHERE key IN ({marks})', part
+                    ):
+                        found[key] = blob
+                now = time.time()
+                hits = [k for k in keys if k in found]
+                self._touched.update((k, now) for k in hits)
+                self._hits += len(hits)
+                self._misses += len(keys) - len(hits)
+                if time.monotonic() - self._flushed_at >= FLUSH_SECONDS:
+                    self._flush(conn)
+        except sqlite3.Error:
+            return [None] * len(texts)
+        return [np.frombuffer(found[k], dtype='<f4') if k in found else None for k in keys]
+
+    def get(self, model, text):
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model, texts, vectors):
+        """Store vectors for texts (None vectors are skipped)."""
+        rows = [(cache_key(model, t), np.asarray(v, dtype='<f4').tobytes(), time.time())
+                for t, v in zip(texts, vectors) if v is not None]
+        if not rows or not self.enabled:
+            return
+        try:
+            with self._lock:
+                conn = self._db()
+                with conn:
+                    conn.executemany('INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)', rows)
+                    self._flush(conn, commit=False)
+                self._since_evict += len(rows)
+                if self._since_evict >= EVICT_EVERY:
+                    self._evict(conn)
+        except sqlite3.Error:
+            pass
+
+    def put(self, model, text, vector):
+        self.put_many(model, [text], [vector])
+
+    def _flush(self, conn, commit=True):
+        """Write pending counters and last-use times (caller holds the lock)."""
+        if self._touched:
+            conn.executemany('UPDATE embeddings SET last_used = ? WHERE key = ?',
+                             [(t, k) for k, t in self._touched.items()])
+        if self._hits:
+            conn.execute("UPDATE stats SET value = value + ? WHERE name = 'hits'", (self._hits,))
+        if self._misses:
+            conn.execute("UPDATE stats SET value = value + ? WHERE name = 'misses'", (self._misses,))
+        if commit:
+            conn.commit()
+        self._touched = {}
+        self._hits = self._misses = 0
+        self._flushed_at = time.monotonic()
+
+    def flush(self):
+        """Persist pending counters and last-use times now."""
+        if not self.enabled or self._conn is None:
+            return
+        try:
+            with self._lock:
+                self._flush(self._conn)
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, conn):
+        """Drop least-recently-used entries beyond max_entries."""
+        self._since_evict = 0
+        count = conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            with conn:
+                conn.execute(
+                    'DELETE FROM embeddings WHERE key IN '
+                    '(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)', (excess,))
+
+    def stats(self):
+        """{'entries', 'hits', 'misses'}."""
+        if not self.enabled:
+            return {'entries': 0, 'hits': 0, 'misses': 0}
+        try:
+            with self._lock:
+                conn = self._db()
+                self._flush(conn)
+                out = dict(conn.execute('SELECT name, value FROM stats').fetchall())
+                out['entries'] = conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        except sqlite3.Error:
+            return {'entries': 0, 'hits': 0, 'misses': 0}
+        return out
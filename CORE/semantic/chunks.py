@@ -0,0 +1,86 @@
+"""
+Content chunks for long memories — table chunks, searched through their own
+vector index (index.get_chunk_index).
+Memories at level chunk_min_level and above are split into chunk_words-word
+windows overlapping by chunk_overlap words. Windows are embedded in batches
+(encode_many) at store time, or later by the pipeline worker. Search scores a
+memory by its best match over summary + chunks (max-sim).
+"""
+
+from config import setting
+from db import bump_generation, embedding_fields, read_memory
+from embed import EMBED_MODEL
+from index import get_chunk_index
+
+
+def chunk_text(text, size=None, overlap=None):
+    """Split text into windows of size words, each overlapping the previous by overlap."""
+    size = size or setting('chunk_words')
+    overlap = setting('chunk_overlap') if overlap is None else overlap
+    words = text.split()
+    if not words:
+        return []
+    step = max(size - overlap, 1)
+    return [' '.join(words[start:start + size]) for start in range(0, max(len(words) - overlap, 1), step)]
+
+
+def chunks_for(level, content):
+    """Chunk texts for a memory, or [] below chunk_min_level."""
+    if level < setting('chunk_min_level'):
+        return []
+    return chunk_text(content)
+
+
+def insert_chunks(conn, mid, texts, vectors=None, bump=True):
+    """Write chunk rows for memory mid (caller commits). vectors align with texts;
+    None entries are embedded later by the pipeline worker.
+    Returns (ids, vectors, generation) to hand to the chunk index after commit.
+    bump=False leaves chunk_generation to the caller (generation None)."""
+    vectors = vectors or [None] * len(texts)
+    ids, embedded = [], []
+    for seq, (text, vec) in enumerate(zip(texts, vectors)):
+        cur = conn.execute(
+            'INSERT INTO chunks (memory_id, seq, text, embedding, embedding_model, embedding_dim) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (mid, seq, text, *embedding_fields(vec, EMBED_MODEL))
+        )
+        if vec is not None:
+            ids.append(cur.lastrowid)
+            embedded.append(vec)
+    generation = bump_generation(conn, 'chunk_generation') if embedded and bump else None
+    return ids, embedded, generation
+
+
+def add_to_index(ids, vectors, generation):
+    if ids:
+        get_chunk_index().add_many(ids, vectors, generation)
+
+
+def chunk_missing(conn):
+    """Create (unembedded) chunk rows for long memories stored before chunking existed.
+    Returns the number of memories chunked."""
+    rows = conn.execute(
+        'SELECT id, level, path FROM memories WHERE level >= ? AND path IS NOT NULL '
+        'AND id NOT IN (SELECT memory_id FROM chunks)', (setting('chunk_min_level'),)
+    ).fetchall()
+    done = 0
+    for r in rows:
+        try:
+            content = read_memory(r['path'])
+        except OSError:
+            continue
+        texts = chunks_for(r['level'], content)
+        if texts:
+            insert_chunks(conn, r['id'], texts)
+            done += 1
+    conn.commit()
+    return done
+
+
+def parents(conn, chunk_ids):
+    """{chunk id: memory id}."""
+    if not chunk_ids:
+        return {}
+    marks = ','.join('?' * len(chunk_ids))
+    rows = conn.execute(f'SELECT id, memory_id FROM chunks WHERE id IN ({marks})', list(chunk_ids))
+    return {r['id']: r['memory_id'] for r in rows}
@@ -0,0 +1,97 @@
+"""
+Tunable settings for semantic memory.
+Defaults live here; DATA/semantic_config.json overrides any key.
+"""
+
+import json
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from _paths import DATA
+
+CONFIG_PATH = DATA / 'semantic_config.json'
+
+DEFAULTS = {
+    # Embedding client. embed_backend: "http" (embedding_service.py) or "local" (in-process model).
+    # Keep embed_batch_size <= the service's LIFE_EMBED_MAX_BATCH.
+    "embed_backend": "http",
+    # Model name recorded with every stored vector; only vectors from this model are searched.
+    # Changing it: set LIFE_EMBED_MODEL to match on the service, then run reembed.py.
+    "embed_model": "all-MiniLM-L6-v2",
+    "embed_batch_size": 64,
+    "embed_binary": True,
+    "embed_cache_size": 100000,  # 0 = no embedding cache
+    "embed_timeout": 10,
+    "embed_batch_timeout": 60,
+    # Circuit breaker: after N consecutive failures, skip the service for cooldown seconds.
+    "embed_breaker_failures": 3,
+    "embed_breaker_cooldown": 30,
+    # Async store: write file + row, return, embed in the background (pipeline.py).
+    # embed_queue_poll: seconds between retries while rows wait on an unavailable service.
+    "store_async": False,
+    "embed_queue_poll": 30,
+
+    # Hybrid ranking: weighted reciprocal-rank fusion, score = sum(w / (k + rank)).
+    "search_limit": 10,
+    "rank_candidates": 50,
+    "rank_rrf_k": 60,
+    "rank_weights": {"keyword": 1.0, "semantic": 1.0, "strength": 0.5, "recency": 0.25},
+    # Ranked results per distinct query, reused until a store/embed or the next cycle (0 = off).
+    "search_cache_size": 256,
+
+    # .md content files: "zlib" or "lzma" writes MEMORY/.../slug.md.zz / .md.xz for memories
+    # at memory_compress_min_level+; "none" writes plain .md. Reads handle every form.
+    "memory_compress": "none",
+    "memory_compress_min_level": 2,
+
+    # Content chunks (chunks.py): memories at chunk_min_level+ also embed their content
+    # in chunk_words-word windows overlapping by chunk_overlap; search takes max-sim.
+    "chunk_min_level": 2,
+    "chunk_words": 128,
+    "chunk_overlap": 32,
+
+    # Similarity graph (links.py): top link_k neighbours per memory at >= link_threshold.
+    "link_k": 8,
+    "link_threshold": 0.5,
+
+    # Cold tier (archive.py): memories whose strength has stayed below archive_threshold
+    # for archive_after cycles move to DATA/semantic_archive.db. Off by default (0 = never);
+    # set e.g. "archive_threshold": 0.05 in DATA/semantic_config.json to turn it on.
+    "archive_threshold": 0,
+    "archive_after": 100,
+
+    # Approximate search (IVF). Below ann_min_size the exact scan is used.
+    "ann_min_size": 20000,
+    "ann_nprobe": 8,
+    "ann_save_every": 256,
+
+    # Quantised scan: "int8" keeps int8 codes + a per-vector scale resident (~4x smaller);
+    # "pca" keeps vectors projected to index_pca_dim principal components, refitted once the
+    # corpus grows index_pca_refit-fold. The best index_rerank (int8) / index_pca_rerank (pca)
+    # candidates are re-scored exactly (0 = no re-rank). "none" = float32.
+    "index_quantize": "none",
+    "index_rerank": 64,
+    "index_pca_dim": 96,
+    "index_pca_rerank": 1024,
+    "index_pca_refit": 2.0,
+}
+
+_config = None
+
+
+def load_config():
+    global _config
+    if _config is None:
+        _config = dict(DEFAULTS)
+        if CONFIG_PATH.exists():
+            try:
+                with open(CONFIG_PATH, 'r') as f:
+                    _config.update(json.load(f))
+            except Exception:
+                pass
+    return _config
+
+
+def setting(key):
+    return load_config().get(key, DEFAULTS.get(key))
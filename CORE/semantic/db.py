@@ -2,18 +2,30 @@
 Shared DB connection and constants for semantic memory.
 """
 
+import json
+import lzma
 import sqlite3
+import zlib
 from pathlib import Path
 import sys
 
+import numpy as np
+
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from _paths import DATA, get_cycle
+from _decay import STRENGTH_KEY_SQL, strength_sql
+from _boost import BoostBuffer
 
 DB = DATA / 'semantic.db'
 MEMORY = DATA.parent / 'MEMORY'
 
 CATEGORIES = ['Relations', 'Knowledge', 'Events', 'Self']
 
+# Embeddings are stored as packed little-endian float32 BLOBs.
+EMBED_DTYPE = np.dtype('<f4')
+
+SCHEMA_VERSION = 11
+
 
 def get_conn():
     conn = sqlite3.connect(DB)
@@ -26,3 +38,375 @@ def ensure_dirs():
     for cat in CATEGORIES:
         for level in [1, 2, 3]:
             (MEMORY / cat / f'L{level}').mkdir(parents=True, exist_ok=True)
+
+
+def memory_file(rel_path):
+    """Absolute path of a memory's .md file from its stored relative path."""
+    return MEMORY / rel_path
+
+
+# Compressed .md content (setting memory_compress): codec → (file suffix, module).
+# Readers go by suffix, so plain files written before (or with "none") stay readable.
+CODECS = {'zlib': ('.zz', zlib), 'lzma': ('.xz', lzma)}
+
+
+def read_memory(rel_path):
+    """A memory's .md content, decompressed if stored as .md.zz / .md.xz."""
+    path = memory_file(rel_path)
+    for suffix, codec in CODECS.values():
+        if path.name.endswith(suffix):
+            return codec.decompress(path.read_bytes()).decode('utf-8')
+    return path.read_text(encoding='utf-8')
+
+
+def memory_exists(path):
+    """True if path exists plain or in any compressed form."""
+    return any(path.with_name(path.name + suffix).exists() for suffix in ['', *(s for s, _ in CODECS.values())])
+
+
+def write_memory(path, content, level):
+    """Write .md content at path (absolute, under MEMORY), compressed per memory_compress
+    from memory_compress_min_level up. Returns the relative path actually written."""
+    from config import setting
+
+    codec = CODECS.get(setting('memory_compress')) if level >= setting('memory_compress_min_level') else None
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if codec:
+        suffix, module = codec
+        path = path.with_name(path.name + suffix)
+        path.write_bytes(module.compress(content.encode('utf-8')))
+    else:
+        path.write_text(content, encoding='utf-8')
+    return path.relative_to(MEMORY).as_posix()
+
+
+def fetch_titles(conn, ids):
+    """{id: title} for the given ids."""
+    if not ids:
+        return {}
+    marks = ','.join('?' * len(ids))
+    rows = conn.execute(f'SELECT id, title FROM memories WHERE id IN ({marks})', list(ids)).fetchall()
+    return {r['id']: r['title'] for r in rows}
+
+
+def get_generation(conn, key='generation'):
+    """Embedding generation counter. Bumped whenever stored vectors change.
+    'generation' tracks memories, 'chunk_generation' tracks chunks."""
+    row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+    return row[0] if row else 0
+
+
+def bump_generation(conn, key='generation'):
+    """Increment a generation inside the caller's transaction. Returns the new value."""
+    conn.execute('UPDATE meta SET value = value + 1 WHERE key = ?', (key,))
+    return get_generation(conn, key)
+
+
+def data_version(conn):
+    """All meta counters as one tuple. Changes whenever rows or vectors do
+    ('data_version' is bumped by store, the generations by embedding writes)."""
+    return tuple((r['key'], r['value']) for r in conn.execute('SELECT key, value FROM meta ORDER BY key'))
+
+
+def reanchor_set(delta_sql):
+    """SET clause adding delta_sql to effective strength and re-anchoring the
+    decay clock at the current cycle. Capped at 1.0."""
+    cycle = get_cycle()
+    return f'base_strength = MIN({strength_sql(cycle)} + {delta_sql}, 1.0), touched_cycle = {int(cycle)}'
+
+
+# Search/expand boosts are written behind, merged per id (see _boost.py).
+BOOSTS = BoostBuffer(DB, 'memories', reanchor_set)
+
+
+def index_text(conn, mid, title, summary, content):
+    """Add a memory to the full-text index (caller commits). No-op without FTS5."""
+    try:
+        conn.execute(
+            'INSERT INTO memories_fts (rowid, title, summary, content) VALUES (?, ?, ?, ?)',
+            (mid, title, summary, content)
+        )
+    except sqlite3.OperationalError:
+        pass
+
+
+def unindex_text(conn, mid, title, summary, content):
+    """Remove a memory from the full-text index (caller commits). The table is
+    contentless, so the indexed values must be passed back. No-op without FTS5."""
+    try:
+        conn.execute(
+            "INSERT INTO memories_fts (memories_fts, rowid, title, summary, content) "
+            "VALUES ('delete', ?, ?, ?, ?)", (mid, title, summary, content)
+        )
+    except sqlite3.OperationalError:
+        pass
+
+
+def pack_embedding(embedding):
+    """Vector → float32 BLOB. None stays None."""
+    if embedding is None:
+        return None
+    return np.asarray(embedding, dtype=EMBED_DTYPE).tobytes()
+
+
+def embedding_fields(embedding, model):
+    """(embedding, embedding_model, embedding_dim) column values. All None without a vector."""
+    if embedding is None:
+        return None, None, None
+    return pack_embedding(embedding), model, len(embedding)
+
+
+def unpack_embedding(value):
+    """BLOB → float32 array (zero-copy view). Legacy JSON text is still accepted."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return np.asarray(json.loads(value), dtype=EMBED_DTYPE)
+    return np.frombuffer(value, dtype=EMBED_DTYPE)
+
+
+# ============ Migrations ============
+
+def _column_type(conn, table, column):
+    for r in conn.execute(f'PRAGMA table_info({table})'):
+        if r['name'] == column:
+            return r['type'].upper()
+    return None
+
+
+def _migrate_blob_embeddings(conn):
+    """v1: embedding TEXT (JSON) → embedding BLOB (float32)."""
+    if _column_type(conn, 'memories', 'embedding') == 'BLOB':
+        rows = conn.execute(
+            "SELECT id, embedding FROM memories WHERE typeof(embedding) = 'text'"
+        ).fetchall()
+        conn.executemany(
+            'UPDATE memories SET embedding = ? WHERE id = ?',
+            ((pack_embedding(unpack_embedding(r['embedding'])), r['id']) for r in rows)
+        )
+        return
+
+    conn.execute('''
+        CREATE TABLE memories_v1 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT, summary TEXT, embedding BLOB,
+            category TEXT, level INTEGER,
+            strength REAL, cycle INTEGER
+        )
+    ''')
+    rows = conn.execute(
+        'SELECT id, title, summary, embedding, category, level, strength, cycle FROM memories'
+    )
+    conn.executemany(
+        'INSERT INTO memories_v1 (id, title, summary, embedding, category, level, strength, cycle) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        ((r['id'], r['title'], r['summary'], pack_embedding(unpack_embedding(r['embedding'])),
+          r['category'], r['level'], r['strength'], r['cycle']) for r in rows)
+    )
+    conn.execute('DROP TABLE memories')
+    conn.execute('ALTER TABLE memories_v1 RENAME TO memories')
+
+
+def _migrate_meta(conn):
+    """v2: meta key/value table holding the embedding generation counter."""
+    conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)')
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0)")
+
+
+def _legacy_paths(conn):
+    """Pre-v5 lookup: {id: .md path} for every memory whose file is found. Titles are
+    re-slugged and each (category, level, slug) group is walked in id order, handing
+    out slug.md, slug_1.md, ... as store's counter did; a file is never given to two
+    rows. Only used by migrations that run before memories.path exists."""
+    import re
+
+    def slugify(title):
+        slug = (title or '').lower().strip()
+        slug = re.sub(r'[^\w\s-]', '', slug)
+        slug = re.sub(r'[\s_]+', '-', slug)
+        return slug[:60].rstrip('-') or 'untitled'
+
+    def counter(path, slug):
+        if path.stem == slug:
+            return 0
+        suffix = path.stem[len(slug):]
+        return int(suffix[1:]) if re.fullmatch(r'_\d+', suffix) else None
+
+    groups = {}
+    for r in conn.execute('SELECT id, title, category, level FROM memories ORDER BY id'):
+        groups.setdefault((r['category'], r['level'], slugify(r['title'])), []).append(r['id'])
+    paths = {}
+    for (category, level, slug), ids in groups.items():
+        dir_path = MEMORY / str(category) / f'L{level}'
+        numbered = ((counter(f, slug), f) for f in dir_path.glob(f'{slug}*.md'))
+        paths.update(zip(ids, [f for n, f in sorted(p for p in numbered if p[0] is not None)]))
+    return paths
+
+
+def _create_fts(conn):
+    """Create the contentless memories_fts table (the text lives in memories and
+    the .md files, so FTS5 keeps only its index). False without FTS5."""
+    try:
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts "
+            "USING fts5(title, summary, content, content = '', tokenize = 'porter unicode61')"
+        )
+    except sqlite3.OperationalError:
+        return False  # SQLite without FTS5: keyword search keeps using LIKE
+    return True
+
+
+def _migrate_fts(conn):
+    """v3: FTS5 index over title, summary and .md content. Backfills missing rows."""
+    if not _create_fts(conn):
+        return
+    rows = conn.execute(
+        'SELECT id, title, summary FROM memories '
+        'WHERE id NOT IN (SELECT rowid FROM memories_fts)'
+    ).fetchall()
+    paths = _legacy_paths(conn) if rows else {}
+    for r in rows:
+        path = paths.get(r['id'])
+        content = path.read_text(encoding='utf-8') if path else ''
+        index_text(conn, r['id'], r['title'], r['summary'], content)
+
+
+def _migrate_lazy_strength(conn):
+    """v4: strength → (base_strength, touched_cycle), decayed at read time (see _decay.py)."""
+    columns = {r['name'] for r in conn.execute('PRAGMA table_info(memories)')}
+    if 'strength' in columns and 'base_strength' not in columns:
+        conn.execute('ALTER TABLE memories RENAME COLUMN strength TO base_strength')
+    if 'touched_cycle' not in columns:
+        conn.execute('ALTER TABLE memories ADD COLUMN touched_cycle INTEGER')
+        # Stored strengths already include every decay up to now.
+        conn.execute('UPDATE memories SET touched_cycle = ?', (get_cycle(),))
+    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_memories_strength ON memories({STRENGTH_KEY_SQL})')
+
+
+def _migrate_paths(conn):
+    """v5: memories.path — .md location relative to MEMORY, resolved once here."""
+    columns = {r['name'] for r in conn.execute('PRAGMA table_info(memories)')}
+    if 'path' not in columns:
+        conn.execute('ALTER TABLE memories ADD COLUMN path TEXT')
+    rows = conn.execute('SELECT id FROM memories WHERE path IS NULL').fetchall()
+    paths = _legacy_paths(conn) if rows else {}
+    for r in rows:
+        path = paths.get(r['id'])
+        if path:
+            conn.execute('UPDATE memories SET path = ? WHERE id = ?',
+                         (path.relative_to(MEMORY).as_posix(), r['id']))
+
+
+def _migrate_embed_queue(conn):
+    """v6: embed_queue — memories waiting for (or just given) an embedding. See pipeline.py."""
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS embed_queue (id INTEGER PRIMARY KEY, done INTEGER DEFAULT 0, similar TEXT)'
+    )
+
+
+def _migrate_embedding_model(conn):
+    """v7: embedding_model + embedding_dim. Earlier vectors all came from all-MiniLM-L6-v2."""
+    columns = {r['name'] for r in conn.execute('PRAGMA table_info(memories)')}
+    if 'embedding_model' not in columns:
+        conn.execute('ALTER TABLE memories ADD COLUMN embedding_model TEXT')
+    if 'embedding_dim' not in columns:
+        conn.execute('ALTER TABLE memories ADD COLUMN embedding_dim INTEGER')
+    conn.execute(
+        "UPDATE memories SET embedding_model = 'all-MiniLM-L6-v2', "
+        "embedding_dim = length(embedding) / 4 "
+        "WHERE embedding IS NOT NULL AND embedding_model IS NULL"
+    )
+
+
+def _migrate_chunks(conn):
+    """v8: chunks — embedded content windows of long memories (chunks.py). Rows are
+    created by the pipeline worker on next start."""
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS chunks ('
+        'id INTEGER PRIMARY KEY AUTOINCREMENT, memory_id INTEGER REFERENCES memories(id), '
+        'seq INTEGER, text TEXT, embedding BLOB, embedding_model TEXT, embedding_dim INTEGER)'
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_chunks_memory ON chunks(memory_id)')
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('chunk_generation', 0)")
+
+
+def _migrate_data_version(conn):
+    """v9: meta.data_version — bumped on every store (search result cache key)."""
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', 0)")
+
+
+def _migrate_links(conn):
+    """v10: memory_links similarity graph (links.py), built once from stored vectors."""
+    import links
+    from config import setting
+
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS memory_links ('
+        'id INTEGER, neighbour_id INTEGER, similarity REAL, PRIMARY KEY (id, neighbour_id)) WITHOUT ROWID'
+    )
+    if not conn.execute('SELECT 1 FROM memory_links LIMIT 1').fetchone():
+        links.rebuild(conn, setting('embed_model'))
+
+
+def _migrate_contentless_fts(conn):
+    """v11: memories_fts without its own copy of the text. A v3 table is dropped
+    and rebuilt from memories and the .md files."""
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'memories_fts'").fetchone()
+    if row is None or "content=''" in row['sql'].replace(' ', ''):
+        return
+    conn.execute('DROP TABLE memories_fts')
+    if not _create_fts(conn):
+        return
+    for r in conn.execute('SELECT id, title, summary, path FROM memories').fetchall():
+        try:
+            content = read_memory(r['path']) if r['path'] else ''
+        except OSError:
+            content = ''
+        index_text(conn, r['id'], r['title'], r['summary'], content)
+
+
+MIGRATIONS = [
+    _migrate_blob_embeddings,
+    _migrate_meta,
+    _migrate_fts,
+    _migrate_lazy_strength,
+    _migrate_paths,
+    _migrate_embed_queue,
+    _migrate_embedding_model,
+    _migrate_chunks,
+    _migrate_data_version,
+    _migrate_links,
+    _migrate_contentless_fts,
+]
+
+
+def migrate():
+    """Bring semantic.db up to SCHEMA_VERSION. Tracked in PRAGMA user_version.
+    Each step is idempotent, so a table created fresh by setup.py passes through safely."""
+    if not DB.exists():
+        return
+    conn = get_conn()
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        conn.close()
+        return
+
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'memories'"
+    ).fetchone()
+    if not exists:
+        conn.close()
+        return
+
+    conn.isolation_level = None
+    try:
+        conn.execute('BEGIN')
+        for step in MIGRATIONS[version:SCHEMA_VERSION]:
+            step(conn)
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
@@ -1,37 +1,271 @@
 """
 Embedding service client. Talks to localhost:5050.
+Checks the persistent embedding cache (cache.py) before calling the model.
+Keep-alive connections are pooled; a circuit breaker skips the service after
+repeated failures so callers fall straight back to keyword/recency results.
+
+The service names its model (X-Embedding-Model / "model"); replies from a
+model other than embed_model are refused, so vectors never mix.
+
+Vectors travel as raw little-endian float32 (Accept: application/octet-stream)
+unless embed_binary is off or the service only speaks JSON.
+
+Backend (setting embed_backend):
+  http  — shared embedding_service.py process (default, multi-process friendly)
+  local — SentenceTransformer loaded once inside this process, no HTTP hop
 """
 
+import http.client
 import json
-import math
-import urllib.request
-import urllib.error
+import os
+import sys
+import threading
+import time
 
-EMBED_URL = 'http://127.0.0.1:5050/encode'
+import numpy as np
 
+from cache import EmbeddingCache
+from config import setting
 
-def encode(text):
-    """Get 384-dim embedding from service. Returns list of floats or None if service down."""
+EMBED_HOST = '127.0.0.1'
+EMBED_PORT = 5050
+EMBED_MODEL = setting('embed_model')
+OCTET_STREAM = 'application/octet-stream'
+
+HEALTH_TIMEOUT = 0.5
+
+_cache = None
+_mismatch_logged = False
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = EmbeddingCache(max_entries=setting('embed_cache_size'))
+    return _cache
+
+
+# ============ HTTP ============
+
+class ModelMismatch(ValueError):
+    """The service answered with vectors from a different model."""
+
+
+class CircuitBreaker:
+    """Closed → open after `threshold` consecutive failures. While open, calls are
+    refused until `cooldown` passes; then a cheap /health probe decides."""
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.failures >= self.threshold
+
+    def allow(self):
+        with self._lock:
+            if not self.is_open:
+                return True
+            if time.monotonic() < self.open_until:
+                return False
+            if _probe_health():
+                self.failures = 0
+                return True
+            self.open_until = time.monotonic() + self.cooldown
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.is_open:
+                self.open_until = time.monotonic() + self.cooldown
+
+
+_breaker = CircuitBreaker(setting('embed_breaker_failures'), setting('embed_breaker_cooldown'))
+_pool = []
+_pool_lock = threading.Lock()
+
+
+def _checkout(timeout):
+    with _pool_lock:
+        conn = _pool.pop() if _pool else None
+    if conn is None:
+        conn = http.client.HTTPConnection(EMBED_HOST, EMBED_PORT, timeout=timeout)
+    else:
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+    return conn
+
+
+def _checkin(conn):
+    with _pool_lock:
+        _pool.append(conn)
+
+
+def _request(method, path, body=None, timeout=None, binary=False):
+    """One request on a pooled keep-alive connection. Retries once if a reused
+    connection turns out to be stale. Returns parsed JSON, or a float32 array
+    (1-D, or 2-D for batches) for binary responses; raises on failure."""
+    timeout = timeout or setting('embed_timeout')
+    headers = {'Content-Type': 'application/json'} if body is not None else {}
+    if binary:
+        headers['Accept'] = OCTET_STREAM
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+
+    for attempt in range(2):
+        conn = _checkout(timeout)
+        reused = conn.sock is not None
+        try:
+            conn.request(method, path, body=data, headers=headers)
+            resp = conn.getresponse()
+            payload = resp.read()
+        except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+            conn.close()
+            if reused and attempt == 0:
+                continue
+            raise
+        except Exception:
+            conn.close()
+            raise
+        _checkin(conn)
+        if resp.status != 200:
+            raise http.client.HTTPException(f'{path}: HTTP {resp.status}')
+        if resp.getheader('Content-Type', '').startswith(OCTET_STREAM):
+            _check_model(resp.getheader('X-Embedding-Model'))
+            vectors = np.frombuffer(payload, dtype='<f4')
+            dim = resp.getheader('X-Embedding-Dim')
+            return vectors.reshape(-1, int(dim)) if dim else vectors
+        result = json.loads(payload)
+        if path != '/health':
+            _check_model(result.get('model'))
+        return result
+
+
+def _check_model(served):
+    """Older services don't name their model; trust those."""
+    if served and served != EMBED_MODEL:
+        raise ModelMismatch(f'service runs {served}, embed_model is {EMBED_MODEL}')
+
+
+def _probe_health():
     try:
-        data = json.dumps({'text': text}).encode('utf-8')
-        req = urllib.request.Request(EMBED_URL, data=data, headers={'Content-Type': 'application/json'})
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            result = json.loads(resp.read())
-            return result.get('embedding')
-    except (urllib.error.URLError, TimeoutError, Exception):
+        return _request('GET', '/health', timeout=HEALTH_TIMEOUT).get('status') == 'ready'
+    except Exception:
+        return False
+
+
+def _call(path, body, timeout=None):
+    """POST through the circuit breaker. Returns the decoded response or None."""
+    if not _breaker.allow():
         return None
+    try:
+        result = _request('POST', path, body, timeout, binary=setting('embed_binary'))
+    except ModelMismatch as e:
+        global _mismatch_logged
+        if not _mismatch_logged:
+            _mismatch_logged = True
+            sys.stderr.write(f"Embedding service model mismatch, not using it: {e}\n")
+            sys.stderr.flush()
+        return None
+    except Exception:
+        _breaker.failure()
+        return None
+    _breaker.success()
+    return result
+
+
+# ============ Local backend ============
+
+_model = None
+_model_failed = False
+_model_lock = threading.Lock()
+
+
+def _local_model():
+    """Load SentenceTransformer on first use. None if unavailable (falls back to HTTP)."""
+    global _model, _model_failed
+    with _model_lock:
+        if _model is None and not _model_failed:
+            try:
+                cache_dir = os.path.expanduser("~/.cache/huggingface")
+                os.environ.setdefault("HF_HOME", cache_dir)
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(EMBED_MODEL, cache_folder=cache_dir)
+            except Exception as e:
+                _model_failed = True
+                sys.stderr.write(f"Local embedding backend unavailable, using HTTP: {e}\n")
+                sys.stderr.flush()
+        return _model
+
+
+def _local_encode(texts):
+    model = _local_model() if setting('embed_backend') == 'local' else None
+    if model is None:
+        return None
+    with _model_lock:
+        return model.encode(texts, batch_size=setting('embed_batch_size'))
+
+
+# ============ Encode ============
+
+def encode(text):
+    """Get 384-dim embedding (cache, then backend). Returns float32 array or None if unavailable."""
+    cached = get_cache().get(EMBED_MODEL, text)
+    if cached is not None:
+        return cached
+
+    embedding = _encode_one(text)
+    get_cache().put(EMBED_MODEL, text, embedding)
+    return embedding
+
+
+def _encode_one(text):
+    """One embedding from the configured backend. Returns float32 array or None if unavailable."""
+    local = _local_encode([text])
+    if local is not None:
+        return np.asarray(local[0], dtype=np.float32)
+    result = _call('/encode', {'text': text})
+    if isinstance(result, np.ndarray):
+        return result.reshape(-1)
+    embedding = result.get('embedding') if result else None
+    return np.asarray(embedding, dtype=np.float32) if embedding else None
 
 
-def cosine_similarity(a, b):
-    """Cosine similarity between two vectors."""
-    if not a or not b or len(a) != len(b):
-        return 0.0
+def _encode_batch(texts):
+    """One batch from the configured backend. Returns 2-D float32 array or None if unavailable."""
+    local = _local_encode(texts)
+    if local is not None:
+        return np.asarray(local, dtype=np.float32)
+    result = _call('/encode_batch', {'texts': texts}, timeout=setting('embed_batch_timeout'))
+    if isinstance(result, np.ndarray):
+        return result
+    embeddings = result.get('embeddings') if result else None
+    return np.asarray(embeddings, dtype=np.float32) if embeddings else None
 
-    dot = sum(x * y for x, y in zip(a, b))
-    mag_a = math.sqrt(sum(x * x for x in a))
-    mag_b = math.sqrt(sum(x * x for x in b))
 
-    if mag_a == 0 or mag_b == 0:
-        return 0.0
+def encode_many(texts, batch_size=None):
+    """Embed many texts, split into batches. Returns a list aligned with texts;
+    entries are None where the service was unavailable."""
+    batch_size = batch_size or setting('embed_batch_size')
+    out = get_cache().get_many(EMBED_MODEL, texts)
+    missing = [i for i, v in enumerate(out) if v is None]
 
-    return dot / (mag_a * mag_b)
+    for start in range(0, len(missing), batch_size):
+        positions = missing[start:start + batch_size]
+        chunk = [texts[i] for i in positions]
+        embeddings = _encode_batch(chunk)
+        if embeddings is None or len(embeddings) != len(chunk):
+            continue
+        for i, embedding in zip(positions, embeddings):
+            out[i] = embedding
+        get_cache().put_many(EMBED_MODEL, chunk, embeddings)
+    return out
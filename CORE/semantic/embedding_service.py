@@ -10,11 +10,40 @@ Usage:
     python embedding_service.py
 
 Runs on http://127.0.0.1:5050
+
+Endpoints:
+    POST /encode        {"text": str}            → {"embedding": [...], "model": str}
+    POST /encode_batch  {"texts": [str, ...]}    → {"embeddings": [[...], ...], "model": str}
+    GET  /health
+
+With "Accept: application/octet-stream" both encode endpoints return raw
+little-endian float32 bytes instead (a packed count x dim matrix for batches),
+described by X-Embedding-Count / X-Embedding-Dim headers.
+
+Concurrent /encode calls are micro-batched: the first request waits up to
+LIFE_EMBED_MAX_WAIT_MS for company, then the whole group runs as one forward
+pass and each caller gets its own vector back.
+
+LIFE's own client (embed.py) checks the persistent embedding cache
+(DATA/embed_cache.db, see cache.py) before calling here, so the service does
+not look it up again by default. Set LIFE_EMBED_CACHE_SIZE for other clients.
+
+Environment:
+    LIFE_EMBED_MAX_BATCH     max texts per forward pass (default 64)
+    LIFE_EMBED_MAX_WAIT_MS   how long /encode waits to fill a batch (default 5, 0 = no wait)
+    LIFE_EMBED_CACHE_SIZE    max cached embeddings, LRU-evicted (default 0 = off)
+    LIFE_EMBED_MODEL         SentenceTransformer model (default all-MiniLM-L6-v2); must match
+                             the client's embed_model setting, which checks X-Embedding-Model
 """
 
-from fastapi import FastAPI, HTTPException
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from fastapi import FastAPI, Header, HTTPException, Response
 from pydantic import BaseModel
 from sentence_transformers import SentenceTransformer
+from cache import EmbeddingCache
+import asyncio
+import numpy as np
 import uvicorn
 import os
 
@@ -23,31 +52,149 @@ cache_dir = os.path.expanduser("~/.cache/huggingface")
 os.environ["TRANSFORMERS_CACHE"] = cache_dir
 os.environ["HF_HOME"] = cache_dir
 
+MAX_BATCH = int(os.environ.get("LIFE_EMBED_MAX_BATCH", "64"))
+MAX_WAIT = float(os.environ.get("LIFE_EMBED_MAX_WAIT_MS", "5")) / 1000
+CACHE_SIZE = int(os.environ.get("LIFE_EMBED_CACHE_SIZE", "0"))
+MODEL_NAME = os.environ.get("LIFE_EMBED_MODEL", "all-MiniLM-L6-v2")
+OCTET_STREAM = "application/octet-stream"
+
 app = FastAPI()
 model = None
 
+# One worker thread: forward passes run off the event loop, one at a time.
+executor = ThreadPoolExecutor(max_workers=1)
+pending = None  # asyncio.Queue of (text, future)
+cache = EmbeddingCache(max_entries=CACHE_SIZE) if CACHE_SIZE > 0 else None
+
 class EmbedRequest(BaseModel):
     text: str
 
+class EmbedBatchRequest(BaseModel):
+    texts: List[str]
+
 @app.on_event("startup")
 async def load_model():
     global model
-    print("Loading sentence transformer (all-MiniLM-L6-v2)...")
-    model = SentenceTransformer("all-MiniLM-L6-v2", cache_folder=cache_dir)
+    print(f"Loading sentence transformer ({MODEL_NAME})...")
+    model = SentenceTransformer(MODEL_NAME, cache_folder=cache_dir)
     print("Model ready")
 
+@app.on_event("startup")
+async def start_batcher():
+    global pending
+    pending = asyncio.Queue()
+    asyncio.create_task(batch_worker())
+
+def wants_binary(accept):
+    return bool(accept) and OCTET_STREAM in accept
+
+def binary_response(vectors, dim=0):
+    """Packed count x dim float32 matrix. dim is only needed when vectors is empty."""
+    if len(vectors):
+        matrix = np.asarray(vectors, dtype="<f4").reshape(len(vectors), -1)
+    else:
+        matrix = np.empty((0, dim), dtype="<f4")
+    return Response(
+        content=matrix.tobytes(),
+        media_type=OCTET_STREAM,
+        headers={"X-Embedding-Count": str(matrix.shape[0]), "X-Embedding-Dim": str(matrix.shape[1]),
+                 "X-Embedding-Model": MODEL_NAME},
+    )
+
+async def run_model(texts):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, lambda: model.encode(texts, batch_size=MAX_BATCH))
+
+async def collect_batch():
+    """Block for one request, then gather more until MAX_BATCH or MAX_WAIT."""
+    batch = [await pending.get()]
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + MAX_WAIT
+    while len(batch) < MAX_BATCH:
+        try:
+            batch.append(pending.get_nowait())
+            continue
+        except asyncio.QueueEmpty:
+            pass
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(pending.get(), remaining))
+        except asyncio.TimeoutError:
+            break
+    return batch
+
+async def batch_worker():
+    while True:
+        batch = await collect_batch()
+        try:
+            embeddings = await run_model([text for text, _ in batch])
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
 @app.get("/health")
 async def health():
-    return {"status": "ready" if model else "loading", "model": "all-MiniLM-L6-v2"}
+    return {
+        "status": "ready" if model else "loading",
+        "model": MODEL_NAME,
+        "max_batch": MAX_BATCH,
+        "cache": cache.stats() if cache else None,
+    }
 
 @app.post("/encode")
-async def encode(request: EmbedRequest):
+async def encode(request: EmbedRequest, accept: Optional[str] = Header(default=None)):
     if not model:
         raise HTTPException(status_code=503, detail="Model not loaded")
     
+    if cache:
+        cached = cache.get(MODEL_NAME, request.text)
+        if cached is not None:
+            if wants_binary(accept):
+                return binary_response([cached])
+            return {"embedding": cached.tolist(), "model": MODEL_NAME}
+
+    try:
+        future = asyncio.get_running_loop().create_future()
+        await pending.put((request.text, future))
+        embedding = await future
+        if cache:
+            cache.put(MODEL_NAME, request.text, embedding)
+        if wants_binary(accept):
+            return binary_response([embedding])
+        return {"embedding": embedding.tolist(), "model": MODEL_NAME}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/encode_batch")
+async def encode_batch(request: EmbedBatchRequest, accept: Optional[str] = Header(default=None)):
+    if not model:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    if len(request.texts) > MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {MAX_BATCH})")
+    if not request.texts:
+        if wants_binary(accept):
+            return binary_response([], model.get_sentence_embedding_dimension())
+        return {"embeddings": [], "model": MODEL_NAME}
+
     try:
-        embedding = model.encode(request.text)
-        return {"embedding": embedding.tolist()}
+        out = cache.get_many(MODEL_NAME, request.texts) if cache else [None] * len(request.texts)
+        missing = [i for i, v in enumerate(out) if v is None]
+        if missing:
+            texts = [request.texts[i] for i in missing]
+            embeddings = await run_model(texts)
+            for i, embedding in zip(missing, embeddings):
+                out[i] = embedding
+            if cache:
+                cache.put_many(MODEL_NAME, texts, embeddings)
+        if wants_binary(accept):
+            return binary_response(out)
+        return {"embeddings": [np.asarray(v).tolist() for v in out], "model": MODEL_NAME}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
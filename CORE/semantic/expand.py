@@ -1,37 +1,15 @@
 """
-Expand handler — read .md file content, boost strength by 0.5.
+Expand handler — read .md file content (decompressed if stored compressed), boost strength by 0.5.
+An archived memory is revived into the hot tier first (archive.py).
 """
 
-from db import get_conn, MEMORY, CATEGORIES
+from db import get_conn, read_memory, BOOSTS
+import archive
+from pipeline import get_worker
 
 EXPAND_BOOST = 0.5
 
 
-def find_file(category, level, title):
-    """Find the .md file for a memory. Checks slug variations."""
-    import re
-
-    slug = title.lower().strip()
-    slug = re.sub(r'[^\w\s-]', '', slug)
-    slug = re.sub(r'[\s_]+', '-', slug)
-    slug = slug[:60].rstrip('-') or 'untitled'
-
-    dir_path = MEMORY / category / f'L{level}'
-    if not dir_path.exists():
-        return None
-
-    # Try exact slug
-    path = dir_path / f'{slug}.md'
-    if path.exists():
-        return path
-
-    # Try slug with counter suffixes
-    for f in dir_path.glob(f'{slug}*.md'):
-        return f
-
-    return None
-
-
 def handle_expand(args):
     """Load full memory content by ID."""
     mid = args.get('id')
@@ -39,31 +17,32 @@ def handle_expand(args):
         return [{"type": "text", "text": "id required."}]
 
     conn = get_conn()
-    row = conn.execute(
-        'SELECT id, title, category, level, strength FROM memories WHERE id = ?',
-        (int(mid),)
-    ).fetchone()
+    query = 'SELECT id, title, category, level, path FROM memories WHERE id = ?'
+    row = conn.execute(query, (int(mid),)).fetchone()
+    revived = row is None and archive.revive(conn, int(mid))
+    if revived:
+        row = conn.execute(query, (int(mid),)).fetchone()
+    conn.close()
+    if revived:
+        get_worker().notify()  # its chunks need embedding
 
     if not row:
-        conn.close()
         return [{"type": "text", "text": f"#{mid} not found."}]
 
-    # Boost strength
-    new_strength = min(row['strength'] + EXPAND_BOOST, 1.0)
-    conn.execute('UPDATE memories SET strength = ? WHERE id = ?', (new_strength, int(mid)))
-    conn.commit()
-    conn.close()
+    # Boost strength (written behind)
+    BOOSTS.add([int(mid)], EXPAND_BOOST)
 
     # Read .md file
-    path = find_file(row['category'], row['level'], row['title'])
-    if not path:
+    try:
+        content = read_memory(row['path']) if row['path'] else None
+    except FileNotFoundError:
+        content = None
+    if content is None:
         return [{"type": "text", "text": f"#{mid} index exists but file not found."}]
 
-    content = path.read_text(encoding='utf-8')
-
     lines = [
         f"=== [{mid}] {row['title']} ===",
-        f"{row['category']}/L{row['level']}",
+        f"{row['category']}/L{row['level']}" + ("  (revived from archive)" if revived else ""),
         "",
         content
     ]
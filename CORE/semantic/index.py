@@ -0,0 +1,285 @@
+"""
+Resident vector index — L2-normalised float32 matrix + id array.
+Holds only vectors from the configured embed_model.
+Backed by the memory-mapped sidecar (vecfile.py), so a fresh server process
+searches without loading anything; rebuilt from semantic.db on drift.
+Top-k is one matrix-vector product plus argpartition; large corpora
+route through the IVF index in ann.py first. With index_quantize = "int8"
+the scan runs on int8 codes (quant.py), with "pca" on PCA-projected rows
+(pca.py); either way only the best candidates are re-scored from the float32
+rows.
+"""
+
+import threading
+
+import numpy as np
+
+import vecfile
+from ann import IVFIndex, IVF_PATH, CHUNK_IVF_PATH
+from quant import Int8Codes, INT8_PATH, CHUNK_INT8_PATH
+from pca import PCAProjection, PCA_PATH, CHUNK_PCA_PATH
+from config import setting
+from db import get_generation, unpack_embedding
+
+
+def normalize(vec):
+    """L2-normalise a vector (float32). Zero vectors stay zero."""
+    vec = np.asarray(vec, dtype=np.float32)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm > 0 else vec
+
+
+def normalize_rows(block):
+    """L2-normalise each row of a 2-D block (float32)."""
+    block = np.asarray(block, dtype=np.float32)
+    norms = np.linalg.norm(block, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return block / norms
+
+
+def top_k(scores, k):
+    """Positions of the k highest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    return top[np.argsort(-scores[top])]
+
+
+class VectorIndex:
+    """Vectors of one table (memories or chunks), its sidecar, IVF, PCA and int8 files and meta generation key."""
+
+    def __init__(self, table='memories', path=vecfile.VEC_PATH, ann_path=IVF_PATH, generation_key='generation',
+                 pca_path=PCA_PATH, int8_path=INT8_PATH):
+        self.table = table
+        self.path = path
+        self.ann_path = ann_path
+        self.pca_path = pca_path
+        self.int8_path = int8_path
+        self.generation_key = generation_key
+        self.dim = None
+        self.count = 0
+        self.max_id = 0
+        self.generation = None
+        self.model = None
+        self.ann = None
+        self._ann_generation = None
+        self.codes = None
+        self._codes_generation = None
+        self._records = None
+        self._lock = threading.Lock()
+
+    @property
+    def ids(self):
+        if self._records is None:
+            return np.empty(0, dtype=np.int64)
+        return self._records['id']
+
+    @property
+    def matrix(self):
+        if self._records is None:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return self._records['vec']
+
+    def _open(self):
+        """Map the sidecar. False if it is missing, truncated or from another model."""
+        header, records = vecfile.open_map(self.path)
+        if header is None or header.model != vecfile.model_tag(setting('embed_model')):
+            return False
+        self.dim = header.dim
+        self.model = header.model
+        self.count = header.count
+        self._records = records
+        self.max_id = int(records['id'][-1]) if header.count else 0  # ids are appended ascending
+        return True
+
+    def _rebuild(self, conn, generation):
+        """Rewrite the sidecar from semantic.db: rows embedded by embed_model only.
+        Rows whose dim differs from the first are skipped."""
+        model = setting('embed_model')
+        rows = conn.execute(
+            f'SELECT id, embedding FROM {self.table} WHERE embedding IS NOT NULL AND embedding_model = ? ORDER BY id',
+            (model,)
+        ).fetchall()
+        vectors = [unpack_embedding(r['embedding']) for r in rows]
+        dim = len(vectors[0]) if vectors else (self.dim or 0)
+        keep = [i for i, v in enumerate(vectors) if len(v) == dim]
+
+        ids = np.array([rows[i]['id'] for i in keep], dtype=np.int64)
+        block = normalize_rows(np.stack([vectors[i] for i in keep])) if keep else np.empty((0, dim), dtype=np.float32)
+        records = vecfile.pack(ids, block, dim)
+        self._records = None
+        self.ann = None
+        self.codes = None
+        try:
+            if dim:
+                vecfile.write_all(records, dim, generation, model, self.path)
+                if self._open():
+                    return
+        except OSError:
+            pass
+        # Sidecar unwritable (e.g. mapped by another process): serve from memory.
+        self.dim = dim or None
+        self.model = vecfile.model_tag(model)
+        self.count = len(records)
+        self._records = records
+        self.max_id = int(ids.max()) if len(ids) else 0
+
+    def refresh(self, conn):
+        """Sync with semantic.db via the generation counter. Remap or rebuild on change."""
+        with self._lock:
+            generation = get_generation(conn, self.generation_key)
+            if generation == self.generation:
+                return
+            header = vecfile.read_header(self.path)
+            if not (header and header.generation == generation and self._open()):
+                self._rebuild(conn, generation)
+            self.generation = generation
+
+    def add(self, mid, embedding, generation):
+        """Append one freshly stored row."""
+        if embedding is None:
+            return
+        self.add_many([mid], [embedding], generation)
+
+    def add_many(self, ids, embeddings, generation):
+        """Append freshly stored rows (ascending ids, one generation bump). No-op until
+        the index has been loaded, or if another writer got in between (the next
+        refresh resyncs)."""
+        if not len(ids):
+            return
+        with self._lock:
+            if self.generation is None or generation != self.generation + 1:
+                return
+            block = normalize_rows(np.stack(embeddings))
+            if block.shape[1] != self.dim or min(ids) <= self.max_id:
+                return
+            if vecfile.append(np.array(ids, dtype=np.int64), block, generation, self.path) and self._open():
+                self.generation = generation
+
+    def _sync_ann(self):
+        """Keep the IVF index in step once the corpus is big enough for it."""
+        if self.count < setting('ann_min_size'):
+            return None
+
+        ann = self.ann
+        if ann is not None and self._ann_generation != self.generation:
+            # The sidecar may have been rebuilt by another process (fewer, reordered or
+            # re-dimensioned rows): keep the buckets only if they still cover a prefix.
+            if (ann.count > self.count or ann.centroids.shape[1] != self.dim
+                    or not np.array_equal(ann.ids, self.ids[:ann.count])):
+                ann = None
+        if ann is None:
+            ann = IVFIndex.load(self.ids, self.dim, self.model, self.ann_path)
+        if ann is None or self.count >= 2 * ann.trained_on:
+            ann = IVFIndex.train(self.ids, self.matrix, self.model, self.ann_path)
+            ann.save()
+        elif ann.count < self.count:
+            ann.extend(self.ids[ann.count:], self.matrix[ann.count:])
+            if ann.unsaved >= setting('ann_save_every'):
+                ann.save()
+        self.ann = ann
+        self._ann_generation = self.generation
+        return ann
+
+    def _sync_codes(self):
+        """Keep the first-pass codes in step with the records: int8 codes when
+        index_quantize is "int8", the PCA projection when it is "pca"."""
+        mode = setting('index_quantize')
+        # Fewer components than the vector dimension, or the projection saves nothing.
+        pca_dim = min(setting('index_pca_dim'), (self.dim or 1) - 1)
+        if mode == 'pca' and (pca_dim < 1 or self.count <= pca_dim):
+            mode = 'none'  # too few rows to fit; the exact scan is cheap anyway
+        if mode not in ('int8', 'pca'):
+            self.codes = None
+            return None
+
+        codes = self.codes
+        if codes is not None and isinstance(codes, PCAProjection) != (mode == 'pca'):
+            codes = None
+        if codes is not None and mode == 'pca' and codes.dim != pca_dim:
+            codes = None
+        if codes is not None and self._codes_generation != self.generation:
+            # Records moved on: appends extend the codes, anything else rebuilds them.
+            if codes.count > self.count or not np.array_equal(codes.ids, self.ids[:codes.count]):
+                codes = None
+
+        if mode == 'pca':
+            if codes is None:
+                codes = PCAProjection.load(self.ids, self.dim, pca_dim, self.model, self.pca_path)
+            if codes is None or self.count >= setting('index_pca_refit') * codes.fitted_on:
+                codes = PCAProjection.fit(self.ids, self.matrix, pca_dim, self.model, self.pca_path)
+                codes.save()
+            elif codes.count < self.count:
+                codes.extend(self.ids[codes.count:], self.matrix[codes.count:])
+                if codes.unsaved >= setting('ann_save_every'):
+                    codes.save()
+        else:
+            if codes is None:
+                codes = Int8Codes.load(self.ids, self.dim, self.model, self.int8_path)
+            if codes is None:
+                codes = Int8Codes.build(self.ids, self.matrix, self.model, self.int8_path)
+                codes.save()
+            elif codes.count < self.count:
+                codes.extend(self.ids[codes.count:], self.matrix[codes.count:])
+                if codes.unsaved >= setting('ann_save_every'):
+                    codes.save()
+        self.codes = codes
+        self._codes_generation = self.generation
+        return codes
+
+    def search(self, conn, query, limit=5, threshold=None):
+        """Top-limit (id, similarity) pairs, best first."""
+        self.refresh(conn)
+        with self._lock:
+            if self.count == 0 or query is None or len(query) != self.dim:
+                return []
+
+            query = normalize(query)
+            rows = None
+            ann = self._sync_ann()
+            if ann is not None:
+                rows = ann.candidates(query, setting('ann_nprobe'))
+                if len(rows) < limit:
+                    rows = None
+
+            hits = None
+            codes = self._sync_codes()
+            if codes is not None:
+                # int8 / PCA first pass; the best index_rerank rows are re-scored exactly below.
+                rerank = setting('index_pca_rerank' if isinstance(codes, PCAProjection) else 'index_rerank')
+                approx = codes.scores(query, rows)
+                top = top_k(approx, max(limit, rerank))
+                positions = top if rows is None else rows[top]
+                if rerank:
+                    rows = positions
+                else:
+                    hits = [(int(self.ids[p]), float(approx[i])) for i, p in zip(top[:limit], positions)]
+
+            if hits is None and rows is None:
+                scores = self.matrix @ query
+                top = top_k(scores, limit)
+                hits = [(int(self.ids[i]), float(scores[i])) for i in top]
+            elif hits is None:
+                scores = self.matrix[rows] @ query
+                top = top_k(scores, limit)
+                hits = [(int(self.ids[rows[i]]), float(scores[i])) for i in top]
+
+        if threshold is not None:
+            hits = [(mid, sim) for mid, sim in hits if sim >= threshold]
+        return hits
+
+
+_index = VectorIndex()
+_chunk_index = VectorIndex('chunks', vecfile.CHUNK_VEC_PATH, CHUNK_IVF_PATH, 'chunk_generation', CHUNK_PCA_PATH,
+                           CHUNK_INT8_PATH)
+
+
+def get_index():
+    """Process-wide index held by the semantic server."""
+    return _index
+
+
+def get_chunk_index():
+    """Process-wide index over content chunks (chunks.py)."""
+    return _chunk_index
@@ -0,0 +1,133 @@
+"""
+Similarity graph — table memory_links (id, neighbour_id, similarity).
+Each embedded memory keeps edges to its top link_k neighbours with
+similarity >= link_threshold. Store links the new memory and offers it to each
+neighbour's own list (trimmed back to link_k), so the graph stays current
+without rescans. The related tool walks it: O(k) per memory per hop.
+"""
+
+import numpy as np
+
+from config import setting
+from db import get_conn, fetch_titles, unpack_embedding
+from index import get_index, normalize_rows
+
+BLOCK = 1024  # rows per similarity block in rebuild
+
+
+def nearest(conn, embedding, exclude=None, hits=None):
+    """Link candidates for a vector from the index (or filtered from hits, a wider
+    search already made): [(id, similarity)], best first."""
+    k = setting('link_k')
+    threshold = setting('link_threshold')
+    if hits is None:
+        hits = get_index().search(conn, embedding, k + 1, threshold=threshold)
+    return [(mid, sim) for mid, sim in hits if mid != exclude and sim >= threshold][:k]
+
+
+def link(conn, mid, hits):
+    """Store mid's edges and the reverse edges (caller commits). Each neighbour keeps its best link_k."""
+    if not hits:
+        return
+    k = setting('link_k')
+    conn.execute('DELETE FROM memory_links WHERE id = ?', (mid,))
+    conn.executemany(
+        'INSERT OR REPLACE INTO memory_links (id, neighbour_id, similarity) VALUES (?, ?, ?)',
+        [(mid, nid, sim) for nid, sim in hits] + [(nid, mid, sim) for nid, sim in hits]
+    )
+    for nid, _ in hits:
+        conn.execute(
+            'DELETE FROM memory_links WHERE id = ? AND neighbour_id NOT IN '
+            '(SELECT neighbour_id FROM memory_links WHERE id = ? ORDER BY similarity DESC LIMIT ?)',
+            (nid, nid, k)
+        )
+
+
+def rebuild(conn, model):
+    """Recompute every memory's edges from the stored vectors of one model, in blocks
+    of one matrix product each (caller commits). Returns the number of edges."""
+    rows = conn.execute(
+        'SELECT id, embedding FROM memories WHERE embedding IS NOT NULL AND embedding_model = ? ORDER BY id',
+        (model,)
+    ).fetchall()
+    conn.execute('DELETE FROM memory_links')
+    vectors = [unpack_embedding(r['embedding']) for r in rows]
+    dim = len(vectors[0]) if vectors else 0
+    keep = [i for i, v in enumerate(vectors) if len(v) == dim]
+    if len(keep) < 2:
+        return 0
+
+    ids = np.array([rows[i]['id'] for i in keep], dtype=np.int64)
+    matrix = normalize_rows(np.stack([vectors[i] for i in keep]))
+    k = min(setting('link_k'), len(matrix) - 1)
+    threshold = setting('link_threshold')
+    edges = []
+    for start in range(0, len(matrix), BLOCK):
+        scores = matrix[start:start + BLOCK] @ matrix.T
+        own = np.arange(len(scores))
+        scores[own, start + own] = -np.inf  # no self-links
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        sims = np.take_along_axis(scores, top, axis=1)
+        for row, col in zip(*np.nonzero(sims >= threshold)):
+            edges.append((int(ids[start + row]), int(ids[top[row, col]]), float(sims[row, col])))
+    conn.executemany('INSERT INTO memory_links (id, neighbour_id, similarity) VALUES (?, ?, ?)', edges)
+    return len(edges)
+
+
+def walk(conn, mid, hops=1, limit=10):
+    """Memories reachable from mid within hops edges. A path scores the product of
+    its similarities; each memory keeps its best path. [(id, score, hop, via)], best first."""
+    best = {mid: (1.0, 0, None)}
+    frontier = [mid]
+    for hop in range(1, hops + 1):
+        if not frontier:
+            break
+        marks = ','.join('?' * len(frontier))
+        edges = conn.execute(
+            f'SELECT id, neighbour_id, similarity FROM memory_links WHERE id IN ({marks})', frontier
+        ).fetchall()
+        # Relax from the scores as they stood at the start of this hop.
+        start = {nid: best[nid][0] for nid in frontier}
+        improved = set()
+        for e in edges:
+            score = start[e['id']] * e['similarity']
+            nid = e['neighbour_id']
+            if nid not in best or score > best[nid][0]:
+                best[nid] = (score, hop, e['id'] if hop > 1 else None)
+                improved.add(nid)
+        frontier = list(improved)
+    del best[mid]
+    ranked = sorted(best.items(), key=lambda item: -item[1][0])[:limit]
+    return [(nid, score, hop, via) for nid, (score, hop, via) in ranked]
+
+
+def handle_related(args):
+    """Memories linked to an ID, optionally several hops out."""
+    if args.get('id') is None:
+        return [{"type": "text", "text": "id required."}]
+    try:
+        mid = int(args['id'])
+        hops = int(args.get('hops', 1))
+        limit = int(args.get('limit', 10))
+    except (TypeError, ValueError):
+        return [{"type": "text", "text": "id, hops and limit must be numbers."}]
+    if hops < 1 or limit < 1:
+        return [{"type": "text", "text": "hops and limit must be at least 1."}]
+    hops = min(hops, 3)
+
+    conn = get_conn()
+    title = fetch_titles(conn, [mid]).get(mid)
+    if title is None:
+        conn.close()
+        return [{"type": "text", "text": f"#{mid} not found."}]
+    related = walk(conn, mid, hops, limit)
+    titles = fetch_titles(conn, [nid for nid, _, _, _ in related])
+    conn.close()
+
+    if not related:
+        return [{"type": "text", "text": f"No links for #{mid} {title}."}]
+    lines = [f"Related to #{mid} {title}"]
+    for nid, score, hop, via in related:
+        path = f"  via #{via}" if via else ""
+        lines.append(f"  ({nid}) {titles.get(nid, '?')}  {score:.2f}{path}")
+    return [{"type": "text", "text": '\n'.join(lines)}]
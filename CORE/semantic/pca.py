@@ -0,0 +1,111 @@
+"""
+PCA projection of the index vectors (setting index_quantize = "pca").
+The top index_pca_dim principal directions are fitted by SVD on (a sample of)
+the L2-normalised rows, and every row is kept projected onto them, so the
+first pass reads index_pca_dim floats per vector instead of the full
+dimension. The best index_rerank candidates are re-scored exactly from the
+float32 sidecar. Persisted to DATA/semantic.pca.npz next to the sidecar;
+refitted once the corpus has grown index_pca_refit-fold since the last fit.
+"""
+
+import numpy as np
+
+from db import DATA
+
+PCA_PATH = DATA / 'semantic.pca.npz'
+CHUNK_PCA_PATH = DATA / 'semantic.chunks.pca.npz'
+
+FIT_SAMPLE = 50000
+CHUNK = 16384
+
+
+def fit_components(matrix, dim, seed=0):
+    """(mean, components) — components is full_dim x dim, orthonormal columns."""
+    sample = matrix
+    if len(matrix) > FIT_SAMPLE:
+        rng = np.random.default_rng(seed)
+        sample = matrix[np.sort(rng.choice(len(matrix), FIT_SAMPLE, replace=False))]
+    mean = sample.mean(axis=0)
+    _, _, vt = np.linalg.svd(sample - mean, full_matrices=False)
+    return mean.astype(np.float32), np.ascontiguousarray(vt[:dim].T, dtype=np.float32)
+
+
+class PCAProjection:
+    """Projected rows of a VectorIndex, by row position."""
+
+    def __init__(self, mean, components, ids, projected, fitted_on, model, path=PCA_PATH):
+        self.mean = mean
+        self.components = components
+        self.ids = ids
+        self.projected = projected
+        self.fitted_on = fitted_on
+        self.model = model
+        self.path = path
+        self.unsaved = 0
+
+    @property
+    def count(self):
+        return len(self.ids)
+
+    @property
+    def dim(self):
+        return self.components.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.projected.nbytes
+
+    def project(self, matrix):
+        out = np.empty((len(matrix), self.dim), dtype=np.float32)
+        for start in range(0, len(matrix), CHUNK):
+            out[start:start + CHUNK] = (matrix[start:start + CHUNK] - self.mean) @ self.components
+        return out
+
+    @classmethod
+    def fit(cls, ids, matrix, dim, model, path=PCA_PATH):
+        mean, components = fit_components(matrix, dim)
+        pca = cls(mean, components, np.array(ids, dtype=np.int64), None, len(matrix), model, path)
+        pca.projected = pca.project(matrix)
+        return pca
+
+    @classmethod
+    def load(cls, ids, full_dim, dim, model, path=PCA_PATH):
+        """Load from disk if it still describes a prefix of ids from the same model
+        at the requested dims. None otherwise."""
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as f:
+                mean, components, saved_ids = f['mean'], f['components'], f['ids']
+                projected, fitted_on = f['projected'], int(f['fitted_on'])
+                saved_model = f['model'].tobytes()
+        except Exception:
+            return None
+        if saved_model != model or components.shape != (full_dim, dim) or len(saved_ids) > len(ids):
+            return None
+        if not np.array_equal(saved_ids, ids[:len(saved_ids)]):
+            return None
+        return cls(mean, components, saved_ids, projected, fitted_on, model, path)
+
+    def save(self):
+        tmp = self.path.with_suffix('.tmp.npz')
+        np.savez(tmp, mean=self.mean, components=self.components, ids=self.ids,
+                 projected=self.projected, fitted_on=np.int64(self.fitted_on),
+                 model=np.frombuffer(self.model, dtype=np.uint8))
+        tmp.replace(self.path)
+        self.unsaved = 0
+
+    def extend(self, ids, matrix):
+        """Project rows appended to the VectorIndex since the last call."""
+        if len(ids) == 0:
+            return
+        self.ids = np.concatenate([self.ids, ids])
+        self.projected = np.concatenate([self.projected, self.project(matrix)])
+        self.unsaved += len(ids)
+
+    def scores(self, query, rows=None):
+        """Approximate query·row for every row (or the given row positions):
+        the projected dot product plus the constant query·mean."""
+        query = np.asarray(query, dtype=np.float32)
+        projected = self.projected if rows is None else self.projected[rows]
+        return projected @ (query @ self.components) + float(query @ self.mean)
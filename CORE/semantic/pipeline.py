@@ -0,0 +1,177 @@
+"""
+Asynchronous embedding pipeline — persistent queue (table embed_queue) drained
+by one background worker thread.
+With store_async on, store writes the file and row with embedding = NULL,
+queues the id and returns. The worker embeds queued rows in batches
+(encode_many), appends them to the index, and keeps their similar memories
+for the next store reply. Rows still missing an embedding are queued again
+at server start. Content chunks with a NULL embedding (chunks.py) are the
+worker's second queue; long memories stored before chunking get chunked
+on its first pass. Once per cycle the worker also moves faded memories to
+the cold tier (archive.sweep).
+"""
+
+import json
+import sys
+import threading
+
+from config import setting
+from chunks import chunk_missing, add_to_index
+import links
+from db import get_conn, get_cycle, bump_generation, embedding_fields
+from embed import encode_many, EMBED_MODEL
+from index import get_index
+
+
+def enqueue(conn, mid):
+    """Queue a memory for embedding (caller commits)."""
+    conn.execute('INSERT OR IGNORE INTO embed_queue (id) VALUES (?)', (mid,))
+
+
+def take_embedded(conn):
+    """Memories embedded since the last report: [(id, title, [(sid, stitle, sim)])].
+    Reported rows leave the queue."""
+    rows = conn.execute(
+        'SELECT q.id, m.title, q.similar FROM embed_queue q JOIN memories m ON m.id = q.id '
+        'WHERE q.done = 1 ORDER BY q.id'
+    ).fetchall()
+    if rows:
+        marks = ','.join('?' * len(rows))
+        conn.execute(f'DELETE FROM embed_queue WHERE id IN ({marks})', [r['id'] for r in rows])
+        conn.commit()
+    return [(r['id'], r['title'], json.loads(r['similar'] or '[]')) for r in rows]
+
+
+class EmbedWorker:
+    def __init__(self):
+        self._wake = threading.Event()
+        self._thread = None
+        self._swept_cycle = None
+
+    def start(self):
+        """Queue every row without an embedding, then start the worker thread."""
+        conn = get_conn()
+        conn.execute('DELETE FROM embed_queue WHERE id NOT IN (SELECT id FROM memories)')
+        conn.execute('INSERT OR IGNORE INTO embed_queue (id) SELECT id FROM memories WHERE embedding IS NULL')
+        conn.commit()
+        conn.close()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='embed-queue', daemon=True)
+            self._thread.start()
+        self.notify()
+
+    def notify(self):
+        """Wake the worker (called after enqueueing)."""
+        self._wake.set()
+
+    def _run(self):
+        try:
+            conn = get_conn()
+            chunk_missing(conn)
+            conn.close()
+        except Exception as e:
+            sys.stderr.write(f"Chunk backfill error: {e}\n")
+            sys.stderr.flush()
+        while True:
+            self._wake.wait(setting('embed_queue_poll'))
+            self._wake.clear()
+            try:
+                while self.drain_batch() or self.drain_chunks():
+                    pass
+            except Exception as e:
+                sys.stderr.write(f"Embed queue error: {e}\n")
+                sys.stderr.flush()
+            try:
+                self.sweep()
+            except Exception as e:
+                sys.stderr.write(f"Archive sweep error: {e}\n")
+                sys.stderr.flush()
+
+    def sweep(self):
+        """Archive faded memories, at most once per cycle."""
+        cycle = get_cycle()
+        if cycle == self._swept_cycle:
+            return
+        import archive  # archive imports this module
+        conn = get_conn()
+        try:
+            archive.sweep(conn)
+        finally:
+            conn.close()
+        self._swept_cycle = cycle
+
+    def drain_batch(self):
+        """Embed one batch of queued rows. False when nothing was embedded
+        (queue empty or service unavailable)."""
+        conn = get_conn()
+        try:
+            rows = conn.execute(
+                'SELECT q.id, m.summary, m.embedding FROM embed_queue q JOIN memories m ON m.id = q.id '
+                'WHERE q.done = 0 ORDER BY q.id LIMIT ?', (setting('embed_batch_size'),)
+            ).fetchall()
+            if not rows:
+                return False
+
+            # Rows embedded elsewhere in the meantime (e.g. re-stored) just leave the queue.
+            stale = [r['id'] for r in rows if r['embedding'] is not None]
+            rows = [r for r in rows if r['embedding'] is None]
+            vectors = encode_many([r['summary'] for r in rows]) if rows else []
+
+            # Similar memories first, against the committed index (see store.find_similar).
+            from store import find_neighbours
+            done = [(r['id'], vec, *find_neighbours(conn, vec, exclude=r['id']))
+                    for r, vec in zip(rows, vectors) if vec is not None]
+
+            added = []
+            for mid, vec, similar, neighbours in done:
+                links.link(conn, mid, neighbours)
+                conn.execute('UPDATE memories SET embedding = ?, embedding_model = ?, embedding_dim = ? WHERE id = ?',
+                             (*embedding_fields(vec, EMBED_MODEL), mid))
+                conn.execute('UPDATE embed_queue SET done = 1, similar = ? WHERE id = ?',
+                             (json.dumps(similar), mid))
+                added.append((mid, vec, bump_generation(conn)))
+            if stale:
+                marks = ','.join('?' * len(stale))
+                conn.execute(f'DELETE FROM embed_queue WHERE id IN ({marks})', stale)
+            conn.commit()
+        finally:
+            conn.close()
+
+        for mid, vec, generation in added:
+            get_index().add(mid, vec, generation)
+        return bool(added or stale)
+
+
+    def drain_chunks(self):
+        """Embed one batch of chunks that have no embedding yet. False when none were embedded."""
+        conn = get_conn()
+        try:
+            rows = conn.execute(
+                'SELECT id, text FROM chunks WHERE embedding IS NULL ORDER BY id LIMIT ?',
+                (setting('embed_batch_size'),)
+            ).fetchall()
+            if not rows:
+                return False
+            vectors = encode_many([r['text'] for r in rows])
+            done = [(r['id'], vec) for r, vec in zip(rows, vectors) if vec is not None]
+            if not done:
+                return False
+            conn.executemany(
+                'UPDATE chunks SET embedding = ?, embedding_model = ?, embedding_dim = ? WHERE id = ?',
+                [(*embedding_fields(vec, EMBED_MODEL), cid) for cid, vec in done]
+            )
+            generation = bump_generation(conn, 'chunk_generation')
+            conn.commit()
+        finally:
+            conn.close()
+
+        add_to_index([cid for cid, _ in done], [vec for _, vec in done], generation)
+        return True
+
+
+_worker = EmbedWorker()
+
+
+def get_worker():
+    """Process-wide worker held by the semantic server."""
+    return _worker
@@ -0,0 +1,100 @@
+"""
+Scalar int8 quantisation of the index vectors (setting index_quantize = "int8").
+Each L2-normalised row is stored as int8 codes plus one float32 scale
+(max |x| / 127), ~4x smaller than float32. Scores from the codes rank
+candidates; the top index_rerank are re-scored exactly from the float32
+sidecar, so only a handful of full-precision rows are touched per query.
+Persisted to DATA/semantic.int8.npz next to the sidecar.
+"""
+
+import numpy as np
+
+from db import DATA
+
+INT8_PATH = DATA / 'semantic.int8.npz'
+CHUNK_INT8_PATH = DATA / 'semantic.chunks.int8.npz'
+
+CHUNK = 1024  # rows converted to float32 at a time (stays cache-sized)
+
+
+def quantize(block):
+    """float32 rows → (int8 codes, float32 per-row scales)."""
+    block = np.asarray(block, dtype=np.float32)
+    scales = np.abs(block).max(axis=1) / 127.0 if len(block) else np.empty(0, dtype=np.float32)
+    scales = scales.astype(np.float32)
+    safe = np.where(scales > 0, scales, 1.0)[:, None]
+    codes = np.clip(np.rint(block / safe), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+class Int8Codes:
+    """Codes for the rows of a VectorIndex, by row position."""
+
+    def __init__(self, ids, codes, scales, model, path=INT8_PATH):
+        self.ids = ids
+        self.codes = codes
+        self.scales = scales
+        self.model = model
+        self.path = path
+        self.unsaved = 0
+
+    @property
+    def count(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.scales.nbytes
+
+    @classmethod
+    def build(cls, ids, matrix, model, path=INT8_PATH):
+        codes = np.empty((len(matrix), matrix.shape[1] if matrix.ndim == 2 else 0), dtype=np.int8)
+        scales = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), CHUNK):
+            codes[start:start + CHUNK], scales[start:start + CHUNK] = quantize(matrix[start:start + CHUNK])
+        return cls(np.array(ids, dtype=np.int64), codes, scales, model, path)
+
+    @classmethod
+    def load(cls, ids, dim, model, path=INT8_PATH):
+        """Load from disk if it still describes a prefix of ids from the same model
+        at the same dimension. None otherwise."""
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as f:
+                saved_ids, codes, scales = f['ids'], f['codes'], f['scales']
+                saved_model = f['model'].tobytes()
+        except Exception:
+            return None
+        if saved_model != model or codes.shape != (len(saved_ids), dim) or len(saved_ids) > len(ids):
+            return None
+        if not np.array_equal(saved_ids, ids[:len(saved_ids)]):
+            return None
+        return cls(saved_ids, codes, scales, model, path)
+
+    def save(self):
+        tmp = self.path.with_suffix('.tmp.npz')
+        np.savez(tmp, ids=self.ids, codes=self.codes, scales=self.scales,
+                 model=np.frombuffer(self.model, dtype=np.uint8))
+        tmp.replace(self.path)
+        self.unsaved = 0
+
+    def extend(self, ids, matrix):
+        """Quantise rows appended to the VectorIndex since the last call."""
+        if len(ids) == 0:
+            return
+        codes, scales = quantize(matrix)
+        self.ids = np.concatenate([self.ids, ids])
+        self.codes = np.concatenate([self.codes, codes])
+        self.scales = np.concatenate([self.scales, scales])
+        self.unsaved += len(ids)
+
+    def scores(self, query, rows=None):
+        """Approximate query·row for every row (or the given row positions)."""
+        query = np.asarray(query, dtype=np.float32)
+        codes = self.codes if rows is None else self.codes[rows]
+        scales = self.scales if rows is None else self.scales[rows]
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), CHUNK):
+            out[start:start + CHUNK] = codes[start:start + CHUNK].astype(np.float32) @ query
+        return out * scales
@@ -0,0 +1,50 @@
+"""
+Query-result cache for semantic search — in-process LRU.
+Key: (whitespace-normalised query, filters, data version, cycle). The data
+version is every counter in meta (db.data_version), bumped by store and by
+any embedding write, so new or re-embedded memories invalidate it; the cycle
+covers decay. Search boosts do not invalidate, so strength reinforcement
+shows up in the ranking from the next store or cycle on.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+def normalize_query(query):
+    """Collapse whitespace. Case is kept: the embedding model may be cased."""
+    return ' '.join(query.split())
+
+
+class QueryCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Cached value or None. Counts a hit or miss."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """{'entries', 'hits', 'misses'} since process start."""
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,108 @@
+"""
+Re-embed semantic memories with the configured model (setting embed_model).
+
+Usage:
+    python reembed.py [--batch N] [--limit N]
+
+Streams every memory (then every content chunk) whose embedding is missing
+or came from another model through the batch path (encode_many →
+/encode_batch), in id order. Each batch commits on its own, so an
+interrupted run picks up where it stopped; rerun until it reports nothing
+left. Prints progress and throughput, then rebuilds the memory_links graph.
+
+For a new model: start embedding_service.py with LIFE_EMBED_MODEL=<name>,
+set "embed_model" in DATA/semantic_config.json, then run this. Until a memory
+is re-embedded it is left out of vector search (keyword search still finds it).
+"""
+
+import argparse
+import sys
+import time
+
+from config import setting
+from db import get_conn, migrate, bump_generation, embedding_fields
+import links
+from embed import encode_many, EMBED_MODEL
+
+STALE = 'embedding IS NULL OR embedding_model IS NOT ?'
+
+# (table, text column, meta generation key)
+TARGETS = [
+    ('memories', 'summary', 'generation'),
+    ('chunks', 'text', 'chunk_generation'),
+]
+
+
+def reembed(table, text_column, generation_key, batch_size, limit=None):
+    """Re-embed stale rows of one table. Returns (done, skipped, seconds), or None
+    if the embedding service stopped answering."""
+    conn = get_conn()
+    total = conn.execute(f'SELECT COUNT(*) FROM {table} WHERE {STALE}', (EMBED_MODEL,)).fetchone()[0]
+    if limit:
+        total = min(total, limit)
+    print(f"{total} {table} to embed with {EMBED_MODEL}")
+
+    done = skipped = 0
+    last_id = 0
+    start = time.perf_counter()
+    while done + skipped < total:
+        rows = conn.execute(
+            f'SELECT id, {text_column} AS text FROM {table} WHERE id > ? AND ({STALE}) ORDER BY id LIMIT ?',
+            (last_id, EMBED_MODEL, min(batch_size, total - done - skipped))
+        ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1]['id']
+
+        vectors = encode_many([r['text'] or '' for r in rows], batch_size)
+        updates = [(*embedding_fields(vec, EMBED_MODEL), r['id'])
+                   for r, vec in zip(rows, vectors) if vec is not None]
+        if not updates:
+            conn.close()
+            print(f"\nEmbedding service unavailable (or serving a different model). "
+                  f"{done} {table} done; rerun to resume.")
+            return None
+
+        conn.executemany(
+            f'UPDATE {table} SET embedding = ?, embedding_model = ?, embedding_dim = ? WHERE id = ?', updates
+        )
+        bump_generation(conn, generation_key)
+        conn.commit()
+
+        done += len(updates)
+        skipped += len(rows) - len(updates)
+        elapsed = time.perf_counter() - start
+        rate = done / elapsed if elapsed > 0 else 0.0
+        sys.stdout.write(f"\r  {done + skipped}/{total} ({100 * (done + skipped) // max(total, 1)}%)  {rate:.0f}/s")
+        sys.stdout.flush()
+
+    conn.close()
+    return done, skipped, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-embed memories with the configured embed_model.')
+    parser.add_argument('--batch', type=int, default=setting('embed_batch_size'),
+                        help='texts per embedding request (default: embed_batch_size)')
+    parser.add_argument('--limit', type=int, default=None, help='stop after this many rows per table')
+    args = parser.parse_args()
+
+    migrate()
+    for table, text_column, generation_key in TARGETS:
+        result = reembed(table, text_column, generation_key, args.batch, args.limit)
+        if result is None:
+            sys.exit(1)
+        done, skipped, seconds = result
+        rate = done / seconds if seconds > 0 else 0.0
+        print(f"\nRe-embedded {done} {table} in {seconds:.1f}s ({rate:.0f}/s). Skipped: {skipped}.")
+
+    # Similarities changed with the model: recompute the link graph.
+    conn = get_conn()
+    edges = links.rebuild(conn, EMBED_MODEL)
+    conn.commit()
+    conn.close()
+    print(f"Rebuilt memory links: {edges} edges.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,52 +1,191 @@
 """
-Search handler — keyword + semantic search, boost 0.1 on hit.
+Search handler — keyword + semantic search fused into one ranking, boost 0.1 on hit.
+deep = true also searches the cold tier (archive.py); archived hits are listed, not boosted.
 """
 
-import json
-from db import get_conn
-from embed import encode, cosine_similarity
+import re
+import sqlite3
+
+import numpy as np
+
+from config import setting
+from db import get_conn, get_cycle, fetch_titles, strength_sql, data_version, BOOSTS
+from embed import encode
+from index import get_index, get_chunk_index
+from chunks import parents
+import archive
+from query_cache import QueryCache, normalize_query
 
 SEARCH_BOOST = 0.1
 
+_results = None
+
+# bm25 column weights: title, summary, content
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+
+def fts_query(query):
+    """Free text → FTS5 MATCH expression: every word, prefix-matched."""
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{w}"*' for w in words)
+
 
 def keyword_search(conn, query, limit=5):
-    """Match query against title column. Up to limit results."""
-    term = f'%{query}%'
-    rows = conn.execute(
-        'SELECT id, title FROM memories WHERE title LIKE ? ORDER BY id DESC LIMIT ?',
-        (term, limit)
-    ).fetchall()
+    """Full-text match on title, summary and content, BM25-ranked. Up to limit results."""
+    match = fts_query(query)
+    if not match:
+        return []
+    try:
+        rows = conn.execute(
+            'SELECT m.id, m.title FROM memories_fts f JOIN memories m ON m.id = f.rowid '
+            'WHERE memories_fts MATCH ? ORDER BY bm25(memories_fts, ?, ?, ?) LIMIT ?',
+            (match, *BM25_WEIGHTS, limit)
+        ).fetchall()
+    except sqlite3.OperationalError:
+        # No FTS5 table (SQLite built without it): plain title match.
+        rows = conn.execute(
+            'SELECT id, title FROM memories WHERE title LIKE ? ORDER BY id DESC LIMIT ?',
+            (f'%{query}%', limit)
+        ).fetchall()
     return [(r['id'], r['title']) for r in rows]
 
 
+# Chunk hits fetched per requested memory (several chunks of one memory may match).
+CHUNK_FANOUT = 4
+
+
+def semantic_hits(conn, query, limit=5):
+    """Embed query, rank memories by their best match over summary vectors and content
+    chunks (max-sim). [(id, similarity)], best first."""
+    query_embedding = encode(query)
+    if query_embedding is None:
+        return []
+    return vector_hits(conn, query_embedding, limit)
+
+
+def vector_hits(conn, query_embedding, limit=5):
+    """semantic_hits for an already embedded query."""
+    best = dict(get_index().search(conn, query_embedding, limit))
+    chunk_hits = get_chunk_index().search(conn, query_embedding, limit * CHUNK_FANOUT)
+    owner = parents(conn, [cid for cid, _ in chunk_hits])
+    for cid, sim in chunk_hits:
+        mid = owner.get(cid)
+        if mid is not None and sim > best.get(mid, -1.0):
+            best[mid] = sim
+    return sorted(best.items(), key=lambda hit: -hit[1])[:limit]
+
+
 def semantic_search(conn, query, limit=5):
-    """Embed query, cosine similarity against all embeddings. Top limit results."""
+    """Embed query, rank against the resident vector index. Top limit results."""
+    hits = semantic_hits(conn, query, limit)
+    titles = fetch_titles(conn, [mid for mid, _ in hits])
+    return [(mid, titles[mid]) for mid, _ in hits if mid in titles]
+
+
+def _ranks(values):
+    """0-based rank of each value, highest first. Ties share the best rank."""
+    desc = np.sort(-values)
+    return np.searchsorted(desc, -values, side='left').astype(float)
+
+
+def rank(conn, query, limit=10):
+    """Hybrid ranking: weighted reciprocal-rank fusion of keyword (BM25) rank,
+    vector similarity rank, strength rank and recency rank over the union of
+    keyword + semantic candidates. Returns ([(id, title, score, breakdown)], embedded),
+    embedded False when the query could not be embedded (keyword-only ranking)."""
+    depth = setting('rank_candidates')
+    kw = keyword_search(conn, query, limit=depth)
     query_embedding = encode(query)
-    if not query_embedding:
+    embedded = query_embedding is not None
+    sem = vector_hits(conn, query_embedding, limit=depth) if embedded else []
+
+    ids = list(dict.fromkeys([mid for mid, _ in kw] + [mid for mid, _ in sem]))
+    if not ids:
+        return [], embedded
+
+    marks = ','.join('?' * len(ids))
+    rows = {r['id']: r for r in conn.execute(
+        f'SELECT id, title, {strength_sql(get_cycle())} AS strength, cycle FROM memories WHERE id IN ({marks})', ids
+    )}
+    ids = [mid for mid in ids if mid in rows]
+    if not ids:
+        return [], embedded
+    pos = {mid: i for i, mid in enumerate(ids)}
+    n = len(ids)
+
+    kw_rank = np.full(n, np.inf)
+    for r, (mid, _) in enumerate(kw):
+        if mid in pos:
+            kw_rank[pos[mid]] = r
+    sem_rank = np.full(n, np.inf)
+    for r, (mid, _) in enumerate(sem):
+        if mid in pos:
+            sem_rank[pos[mid]] = r
+
+    strength = np.array([rows[mid]['strength'] or 0.0 for mid in ids])
+    recency = np.array([(rows[mid]['cycle'] or 0) + mid * 1e-9 for mid in ids])
+
+    weights = setting('rank_weights')
+    k = setting('rank_rrf_k')
+    parts = {
+        'keyword': weights['keyword'] / (k + 1 + kw_rank),
+        'semantic': weights['semantic'] / (k + 1 + sem_rank),
+        'strength': weights['strength'] / (k + 1 + _ranks(strength)),
+        'recency': weights['recency'] / (k + 1 + _ranks(recency)),
+    }
+    score = sum(parts.values())
+
+    top = np.argsort(-score, kind='stable')[:limit]
+    return [
+        (ids[i], rows[ids[i]]['title'], float(score[i]), {name: float(v[i]) for name, v in parts.items()})
+        for i in top
+    ], embedded
+
+
+def deep_search(conn, query, limit=10):
+    """Archived memories for query: reciprocal-rank fusion of keyword and vector rank
+    (no strength/recency — everything archived has faded). [(id, title)]."""
+    if not archive.exists():
         return []
+    depth = setting('rank_candidates')
+    match = fts_query(query)
+    kw = archive.keyword_hits(conn, match, BM25_WEIGHTS, depth) if match else []
+    query_embedding = encode(query)
+    sem = archive.vector_hits(conn, query_embedding, depth) if query_embedding is not None else []
 
-    rows = conn.execute(
-        'SELECT id, title, embedding FROM memories WHERE embedding IS NOT NULL'
-    ).fetchall()
+    weights = setting('rank_weights')
+    k = setting('rank_rrf_k')
+    score = {}
+    for w, hits in ((weights['keyword'], kw), (weights['semantic'], sem)):
+        for r, mid in enumerate(hits):
+            score[mid] = score.get(mid, 0.0) + w / (k + 1 + r)
+    top = sorted(score, key=lambda mid: -score[mid])[:limit]
+    titles = archive.titles(conn, top)
+    return [(mid, titles[mid]) for mid in top if mid in titles]
 
-    scored = []
-    for r in rows:
-        stored = json.loads(r['embedding'])
-        sim = cosine_similarity(query_embedding, stored)
-        scored.append((r['id'], r['title'], sim))
 
-    scored.sort(key=lambda x: x[2], reverse=True)
-    return [(sid, stitle) for sid, stitle, _ in scored[:limit]]
+def get_result_cache():
+    global _results
+    if _results is None:
+        _results = QueryCache(setting('search_cache_size'))
+    return _results
 
 
-def boost_results(conn, ids):
-    """Small boost on search hit."""
-    for mid in ids:
-        conn.execute(
-            'UPDATE memories SET strength = MIN(strength + ?, 1.0) WHERE id = ?',
-            (SEARCH_BOOST, mid)
-        )
-    conn.commit()
+def cached_rank(conn, query, limit):
+    """rank(), memoised per (query, limit) until semantic.db changes or the cycle moves on.
+    A keyword-only ranking (embedding unavailable) is returned but not cached."""
+    key = (normalize_query(query), limit, data_version(conn), get_cycle())
+    ranked = get_result_cache().get(key)
+    if ranked is None:
+        ranked, embedded = rank(conn, query, limit)
+        if embedded:
+            get_result_cache().put(key, ranked)
+    return ranked
+
+
+def boost_results(ids):
+    """Small boost on search hit. Queued; flushed in one write later."""
+    BOOSTS.add(ids, SEARCH_BOOST)
 
 
 def handle_search(args):
@@ -68,29 +207,25 @@ def handle_search(args):
         lines = [f"({r['id']}) {r['title']}" for r in rows]
         return [{"type": "text", "text": '\n'.join(lines)}]
 
-    # Two passes
-    kw_results = keyword_search(conn, query, limit=5)
-    sem_results = semantic_search(conn, query, limit=5)
-
-    # Deduplicate — keyword first
-    seen = set()
-    combined = []
-    for mid, title in kw_results:
-        if mid not in seen:
-            seen.add(mid)
-            combined.append((mid, title))
-    for mid, title in sem_results:
-        if mid not in seen:
-            seen.add(mid)
-            combined.append((mid, title))
-
-    if not combined:
+    ranked = cached_rank(conn, query, limit=setting('search_limit'))
+    archived = deep_search(conn, query, limit=setting('search_limit')) if args.get('deep') else []
+
+    if not ranked and not archived:
         conn.close()
         return [{"type": "text", "text": f"No memories matching '{query}'."}]
 
     # Boost all hit IDs
-    boost_results(conn, [mid for mid, _ in combined])
+    boost_results([mid for mid, _, _, _ in ranked])
     conn.close()
 
-    lines = [f"({mid}) {title}" for mid, title in combined]
+    if args.get('explain'):
+        lines = [
+            f"({mid}) {title}  [{score:.4f} = kw {b['keyword']:.4f} + sem {b['semantic']:.4f}"
+            f" + str {b['strength']:.4f} + rec {b['recency']:.4f}]"
+            for mid, title, score, b in ranked
+        ]
+    else:
+        lines = [f"({mid}) {title}" for mid, title, _, _ in ranked]
+    if archived:
+        lines += ["", "Archived (expand to revive)"] + [f"  ({mid}) {title}" for mid, title in archived]
     return [{"type": "text", "text": '\n'.join(lines)}]
@@ -11,10 +11,14 @@ sys.stdout.reconfigure(encoding='utf-8')
 sys.path.insert(0, str(Path(__file__).resolve().parent))
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-from db import ensure_dirs
+from db import ensure_dirs, migrate
 from store import handle_store
 from search import handle_search
 from expand import handle_expand
+from stats import handle_stats
+from links import handle_related
+from bulk import handle_store_many, handle_export
+from pipeline import get_worker
 from _needs import update_needs
 
 
@@ -53,7 +57,9 @@ TOOLS = [
         "inputSchema": {
             "type": "object",
             "properties": {
-                "query": {"type": "string", "description": "Search term"}
+                "query": {"type": "string", "description": "Search term"},
+                "explain": {"type": "boolean", "description": "Show score breakdown"},
+                "deep": {"type": "boolean", "description": "Also search archived (faded) memories"}
             },
             "required": []
         }
@@ -68,6 +74,55 @@ TOOLS = [
             },
             "required": ["id"]
         }
+    },
+    {
+        "name": "related",
+        "description": "Memories linked to an ID by similarity.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "id": {"type": "number", "description": "Memory ID"},
+                "hops": {"type": "number", "description": "Follow links this many steps out (1-3, default 1)"},
+                "limit": {"type": "number", "description": "Max results (default 10)"}
+            },
+            "required": ["id"]
+        }
+    },
+    {
+        "name": "store_many",
+        "description": "Save many memories at once (batched embeds, one transaction, no similarity report).",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "records": {"type": "array", "items": {"type": "object"},
+                            "description": "Objects with title, category, summary, content (optional cycle, strength)"},
+                "path": {"type": "string", "description": "NDJSON file of such records (absolute or relative to the LIFE root)"}
+            },
+            "required": []
+        }
+    },
+    {
+        "name": "export",
+        "description": "Write all memories to an NDJSON file.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "path": {"type": "string", "description": "Output file (absolute or relative to the LIFE root)"},
+                "category": {"type": "string", "description": "Only this category"},
+                "archived": {"type": "boolean", "description": "Include archived memories"},
+                "embeddings": {"type": "boolean", "description": "Include vectors (base64 float32)"}
+            },
+            "required": ["path"]
+        }
+    },
+    {
+        "name": "stats",
+        "description": "Memory counts and cache hit rates.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
     }
 ]
 
@@ -103,6 +158,14 @@ def handle_request(req):
                 result = handle_search(args)
             elif name == "expand":
                 result = handle_expand(args)
+            elif name == "related":
+                result = handle_related(args)
+            elif name == "store_many":
+                result = handle_store_many(args)
+            elif name == "export":
+                result = handle_export(args)
+            elif name == "stats":
+                result = handle_stats(args)
             else:
                 send_error(rid, -32601, f"Unknown tool: {name}")
                 return
@@ -118,6 +181,8 @@ def handle_request(req):
 
 def main():
     ensure_dirs()
+    migrate()
+    get_worker().start()
     while True:
         try:
             line = sys.stdin.readline()
@@ -0,0 +1,46 @@
+"""
+Stats handler — sizes, queue depth and cache hit rates for semantic memory.
+"""
+
+from config import setting
+from db import get_conn
+import archive
+from embed import get_cache, EMBED_MODEL
+from index import get_index, get_chunk_index
+from search import get_result_cache
+
+
+def hit_rate(stats):
+    total = stats['hits'] + stats['misses']
+    return f"{stats['hits']}/{total} ({100 * stats['hits'] / total:.0f}%)" if total else "0/0"
+
+
+def handle_stats(args):
+    """Show memory counts and cache metrics."""
+    conn = get_conn()
+    memories, embedded = conn.execute(
+        'SELECT COUNT(*), COUNT(embedding) FROM memories'
+    ).fetchone()
+    chunks, chunks_embedded = conn.execute(
+        'SELECT COUNT(*), COUNT(embedding) FROM chunks'
+    ).fetchone()
+    queued = conn.execute('SELECT COUNT(*) FROM embed_queue WHERE done = 0').fetchone()[0]
+    archived = archive.count(conn)
+    conn.close()
+
+    results = get_result_cache().stats()
+    embeds = get_cache().stats()
+    index, chunk_index = get_index(), get_chunk_index()
+
+    lines = [
+        f"Memories: {memories} ({embedded} embedded, {queued} queued)",
+        f"Chunks: {chunks} ({chunks_embedded} embedded)",
+        f"Archived: {archived}",
+        f"Model: {EMBED_MODEL}",
+        f"Index: {index.count} vectors, {chunk_index.count} chunk vectors"
+        + (f" ({setting('index_quantize')})" if index.codes is not None else ""),
+        "",
+        f"Search cache: {hit_rate(results)} hits, {results['entries']} entries",
+        f"Embedding cache: {hit_rate(embeds)} hits, {embeds['entries']} entries",
+    ]
+    return [{"type": "text", "text": '\n'.join(lines)}]
@@ -2,10 +2,17 @@
 Store handler — write .md, embed summary, insert DB row.
 """
 
-import json
 import re
-from db import get_conn, get_cycle, MEMORY, CATEGORIES
-from embed import encode, cosine_similarity
+from db import (get_conn, get_cycle, bump_generation, fetch_titles, index_text, embedding_fields,
+                memory_exists, write_memory, MEMORY, CATEGORIES)
+from config import setting
+from embed import encode, encode_many, EMBED_MODEL
+from chunks import chunks_for, insert_chunks, add_to_index
+import links
+from index import get_index
+from pipeline import enqueue, take_embedded, get_worker
+
+REPORT_EMBEDDED = 10  # background-embedded memories listed per store reply
 
 
 def slugify(title):
@@ -31,43 +38,44 @@ def level_from_words(count):
         return 3
 
 
-def find_similar(conn, embedding, threshold=0.75, limit=5):
-    """Find memories with similar embeddings."""
-    if not embedding:
+def find_similar(conn, embedding, threshold=0.75, limit=5, hits=None):
+    """Find memories with similar embeddings (filtered from hits when given)."""
+    if embedding is None:
         return []
 
-    rows = conn.execute(
-        'SELECT id, title, embedding FROM memories WHERE embedding IS NOT NULL'
-    ).fetchall()
+    if hits is None:
+        hits = get_index().search(conn, embedding, limit, threshold=threshold)
+    hits = [(mid, sim) for mid, sim in hits if sim >= threshold][:limit]
+    titles = fetch_titles(conn, [mid for mid, _ in hits])
+    return [(mid, titles[mid], sim) for mid, sim in hits if mid in titles]
 
-    scored = []
-    for r in rows:
-        stored = json.loads(r['embedding'])
-        sim = cosine_similarity(embedding, stored)
-        if sim >= threshold:
-            scored.append((r['id'], r['title'], sim))
 
-    scored.sort(key=lambda x: x[2], reverse=True)
-    return scored[:limit]
+def find_neighbours(conn, embedding, exclude=None):
+    """find_similar and links.nearest from one index search: (similar, link hits)."""
+    depth = max(5, setting('link_k')) + 1
+    hits = get_index().search(conn, embedding, depth, threshold=min(0.75, setting('link_threshold')))
+    hits = [(mid, sim) for mid, sim in hits if mid != exclude]
+    return find_similar(conn, embedding, hits=hits), links.nearest(conn, embedding, hits=hits)
 
 
-def handle_store(args):
-    """Save a memory."""
-    title = args.get('title', '').strip()
-    category = args.get('category', '').strip()
-    summary = args.get('summary', '').strip()
-    content = args.get('content', '').strip()
+def prepare(args):
+    """Validate and normalise store arguments.
+    Returns ((title, category, summary, content, level), None) or (None, error message)."""
+    title = str(args.get('title') or '').strip()
+    category = str(args.get('category') or '').strip()
+    summary = str(args.get('summary') or '').strip()
+    content = str(args.get('content') or '').strip()
 
     if not title:
-        return [{"type": "text", "text": "title required."}]
+        return None, "title required."
     if not category:
-        return [{"type": "text", "text": "category required."}]
+        return None, "category required."
     if category not in CATEGORIES:
-        return [{"type": "text", "text": f"category must be: {', '.join(CATEGORIES)}"}]
+        return None, f"category must be: {', '.join(CATEGORIES)}"
     if not summary:
-        return [{"type": "text", "text": "summary required."}]
+        return None, "summary required."
     if not content:
-        return [{"type": "text", "text": "content required."}]
+        return None, "content required."
 
     # Enforce summary length
     summary_words = summary.split()
@@ -75,41 +83,72 @@ def handle_store(args):
         summary = ' '.join(summary_words[:75])
 
     # Calculate level
-    wc = word_count(content)
-    level = level_from_words(wc)
+    level = level_from_words(word_count(content))
+    return (title, category, summary, content, level), None
 
-    # Get embedding
-    embedding = encode(summary)
-    embedding_json = json.dumps(embedding) if embedding else None
-
-    # Find similar memories (before storing, so we don't match ourselves)
-    conn = get_conn()
-    similar = find_similar(conn, embedding) if embedding else []
 
-    # Write .md file
+def unique_file(category, level, title):
+    """Free MEMORY/{category}/L{level}/{slug}[_N].md path (any compressed form counts as taken)."""
     slug = slugify(title)
     dir_path = MEMORY / category / f'L{level}'
-    dir_path.mkdir(parents=True, exist_ok=True)
-
-    # Find unique filename
     file_path = dir_path / f'{slug}.md'
     counter = 1
-    while file_path.exists():
+    while memory_exists(file_path):
         file_path = dir_path / f'{slug}_{counter}.md'
         counter += 1
+    return file_path
+
+
+def handle_store(args):
+    """Save a memory."""
+    fields, error = prepare(args)
+    if error:
+        return [{"type": "text", "text": error}]
+    title, category, summary, content, level = fields
 
-    file_path.write_text(content, encoding='utf-8')
+    # Get embedding (async mode: leave it to the embed queue)
+    queued = setting('store_async')
+    embedding = None if queued else encode(summary)
+    embedding_blob, embedding_model, embedding_dim = embedding_fields(embedding, EMBED_MODEL)
+
+    # Long memories: content windows, embedded in one batched pass
+    chunk_texts = chunks_for(level, content)
+    chunk_vectors = encode_many(chunk_texts) if chunk_texts and not queued else None
+
+    # Find similar memories (before storing, so we don't match ourselves)
+    conn = get_conn()
+    similar, neighbours = find_neighbours(conn, embedding) if embedding is not None else ([], [])
+
+    # Write .md file under a unique name
+    rel_path = write_memory(unique_file(category, level, title), content, level)
 
     # Insert DB row
     cycle = get_cycle()
     conn.execute(
-        'INSERT INTO memories (title, summary, embedding, category, level, strength, cycle) VALUES (?, ?, ?, ?, ?, ?, ?)',
-        (title, summary, embedding_json, category, level, 1.0, cycle)
+        'INSERT INTO memories (title, summary, embedding, embedding_model, embedding_dim, '
+        'category, level, base_strength, touched_cycle, cycle, path) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (title, summary, embedding_blob, embedding_model, embedding_dim,
+         category, level, 1.0, cycle, cycle, rel_path)
     )
-    conn.commit()
     mid = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+    index_text(conn, mid, title, summary, content)
+    chunk_ids, chunk_embedded, chunk_generation = insert_chunks(conn, mid, chunk_texts, chunk_vectors)
+    links.link(conn, mid, neighbours)
+    generation = bump_generation(conn) if embedding is not None else None
+    bump_generation(conn, 'data_version')
+    if embedding is None:
+        enqueue(conn, mid)
+    conn.commit()
+    embedded = take_embedded(conn)
     conn.close()
 
+    add_to_index(chunk_ids, chunk_embedded, chunk_generation)
+    if embedding is not None:
+        get_index().add(mid, embedding, generation)
+    if embedding is None or len(chunk_ids) < len(chunk_texts):
+        get_worker().notify()
+
     # Build response
     lines = [f"Stored. #{mid} [{category}/L{level}] — {title}"]
 
@@ -121,6 +160,15 @@ def handle_store(args):
     else:
         lines.append("")
         lines.append("Similar Memory(ies)")
-        lines.append("  None found.")
+        lines.append("  Pending — embedding queued." if queued else "  None found.")
+
+    if embedded:
+        lines.append("")
+        lines.append("Embedded Since Last Store")
+        for eid, etitle, esimilar in embedded[-REPORT_EMBEDDED:]:
+            found = ', '.join(f"({sid}) {stitle}" for sid, stitle, _ in esimilar) or 'no similar memories'
+            lines.append(f"  #{eid} {etitle} → {found}")
+        if len(embedded) > REPORT_EMBEDDED:
+            lines.append(f"  (+{len(embedded) - REPORT_EMBEDDED} earlier)")
 
     return [{"type": "text", "text": '\n'.join(lines)}]
@@ -0,0 +1,102 @@
+"""
+Embedding sidecar — DATA/semantic.vec, memory-mapped read-only by the server.
+Append-only, fixed-stride records (int64 id + L2-normalised float32[dim])
+behind a small header: magic, dim, generation, count, model tag.
+The header generation mirrors meta.generation in semantic.db and the model
+tag names the embed_model the vectors came from; any mismatch means the file
+has drifted from the table and gets rebuilt.
+"""
+
+import hashlib
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+from db import DATA
+
+VEC_PATH = DATA / 'semantic.vec'
+CHUNK_VEC_PATH = DATA / 'semantic.chunks.vec'
+
+MAGIC = b'LIFEVEC1'
+HEADER = struct.Struct('<8sIQQ16s')
+HEADER_SIZE = 64
+
+Header = namedtuple('Header', 'dim generation count model')
+
+
+def model_tag(model):
+    """16-byte digest of a model name, as stored in the header."""
+    return hashlib.sha256(model.encode('utf-8')).digest()[:16]
+
+
+def record_dtype(dim):
+    return np.dtype([('id', '<i8'), ('vec', '<f4', (dim,))])
+
+
+def read_header(path=VEC_PATH):
+    """Header of the sidecar, or None if missing/corrupt."""
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read(HEADER.size)
+    except OSError:
+        return None
+    if len(raw) < HEADER.size:
+        return None
+    magic, dim, generation, count, model = HEADER.unpack(raw)
+    if magic != MAGIC or dim == 0:
+        return None
+    return Header(dim, generation, count, model)
+
+
+def _write_header(f, header):
+    f.seek(0)
+    f.write(HEADER.pack(MAGIC, header.dim, header.generation, header.count, header.model).ljust(HEADER_SIZE, b'\0'))
+
+
+def open_map(path=VEC_PATH):
+    """(header, read-only record memmap) or (None, None) if the file is unusable."""
+    header = read_header(path)
+    if header is None:
+        return None, None
+    dtype = record_dtype(header.dim)
+    if path.stat().st_size < HEADER_SIZE + header.count * dtype.itemsize:
+        return None, None
+    if header.count == 0:
+        return header, np.empty(0, dtype=dtype)
+    records = np.memmap(path, dtype=dtype, mode='r', offset=HEADER_SIZE, shape=(header.count,))
+    return header, records
+
+
+def pack(ids, matrix, dim):
+    """Rows → record array in the on-disk layout."""
+    records = np.empty(len(ids), dtype=record_dtype(dim))
+    records['id'] = ids
+    records['vec'] = matrix
+    return records
+
+
+def write_all(records, dim, generation, model, path=VEC_PATH):
+    """Replace the sidecar with the given records (atomic rename)."""
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'wb') as f:
+        _write_header(f, Header(dim, generation, len(records), model_tag(model)))
+        f.seek(HEADER_SIZE)
+        f.write(records.tobytes())
+    tmp.replace(path)
+
+
+def append(ids, matrix, generation, path=VEC_PATH):
+    """Append rows after the last committed record, then publish the new header."""
+    header = read_header(path)
+    if header is None:
+        return False
+    dtype = record_dtype(header.dim)
+    records = pack(ids, matrix, header.dim)
+    with open(path, 'r+b') as f:
+        f.seek(HEADER_SIZE + header.count * dtype.itemsize)
+        f.write(records.tobytes())
+        f.truncate()
+        f.flush()
+        _write_header(f, Header(header.dim, generation, header.count + len(ids), header.model))
+    return True
@@ -5,6 +5,7 @@ Returns summary for matches.
 """
 
 from db import get_conn, SEMANTIC_DB
+from _decay import STRENGTH_KEY_SQL
 
 
 def pull_predictive(input_text):
@@ -23,7 +24,7 @@ def pull_predictive(input_text):
 
     for word in words:
         rows = conn.execute(
-            'SELECT id, title, summary FROM memories WHERE LOWER(title) LIKE ? ORDER BY strength DESC',
+            f'SELECT id, title, summary FROM memories WHERE LOWER(title) LIKE ? ORDER BY {STRENGTH_KEY_SQL} DESC',
             (f'%{word}%',)
         ).fetchall()
 
@@ -50,6 +50,14 @@ def create_directories():
     print(f"  {len(dirs)} directories ready.")
 
 
+def migrate_semantic():
+    """Bring an existing semantic.db up to the current schema (semantic/db.py)."""
+    import sys
+    sys.path.insert(0, str(CORE / "semantic"))
+    from db import migrate
+    migrate()
+
+
 def init_databases():
     """Initialize all databases with empty tables."""
     print("Initializing databases...")
@@ -122,13 +130,37 @@ def init_databases():
     """)
 
     # --- semantic.db --- long-term memory
+    # An existing file may predate the columns and tables below: upgrade it first.
+    if (DATA / "semantic.db").exists():
+        migrate_semantic()
     init("semantic.db", """
     CREATE TABLE IF NOT EXISTS memories (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
-        title TEXT, summary TEXT, embedding TEXT,
+        title TEXT, summary TEXT, embedding BLOB,
         category TEXT, level INTEGER,
-        strength REAL, cycle INTEGER
+        base_strength REAL, touched_cycle INTEGER, cycle INTEGER,
+        path TEXT, embedding_model TEXT, embedding_dim INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS idx_memories_strength
+        ON memories((base_strength + 0.01 * (touched_cycle / 10)));
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY, value INTEGER
+    );
+    INSERT OR IGNORE INTO meta (key, value)
+        VALUES ('generation', 0), ('chunk_generation', 0), ('data_version', 0);
+    CREATE TABLE IF NOT EXISTS embed_queue (
+        id INTEGER PRIMARY KEY, done INTEGER DEFAULT 0, similar TEXT
+    );
+    CREATE TABLE IF NOT EXISTS chunks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        memory_id INTEGER REFERENCES memories(id), seq INTEGER, text TEXT,
+        embedding BLOB, embedding_model TEXT, embedding_dim INTEGER
     );
+    CREATE INDEX IF NOT EXISTS idx_chunks_memory ON chunks(memory_id);
+    CREATE TABLE IF NOT EXISTS memory_links (
+        id INTEGER, neighbour_id INTEGER, similarity REAL,
+        PRIMARY KEY (id, neighbour_id)
+    ) WITHOUT ROWID;
     """)
 
     # --- working.db --- active threads
@@ -188,7 +220,7 @@ def init_databases():
     );
     """)
 
-    print(f"\n  10 databases, 12 tables.")
+    print(f"\n  10 databases, 16 tables.")
 
 
 def seed_first_memory():
@@ -265,9 +297,9 @@ After genesis, traits live in traits.db and your origin story lives in DATA/hist
     filepath.write_text(content, encoding='utf-8')
 
     c.execute('''
-        INSERT INTO memories (title, summary, embedding, category, level, strength, cycle)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (title, summary, None, category, level, 1.0, 1))
+        INSERT INTO memories (title, summary, embedding, category, level, base_strength, touched_cycle, cycle, path)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (title, summary, None, category, level, 1.0, 1, 1, f"{category}/L{level}/life-system-guide.md"))
 
     conn.commit()
     conn.close()